@@ -0,0 +1,185 @@
+"""
+Нагрузочный тест горячих ручек API: /get_appointments, /login, /balance и
+/predict (обе модели) под заданной конкурентностью. Отчет - задержки
+p50/p95/p99, пропускная способность и ошибки по каждой ручке в JSON.
+
+База заполняется заранее (python -m benchmarks.seed --reset). По умолчанию
+сервер запускается здесь же (uvicorn main:app), с --base-url используется
+уже запущенный:
+    python -m benchmarks.api --requests 2000 --concurrency 16 --output api.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from sqlalchemy import text
+from config.database import async_session_maker, engine
+from core.entities import User  # noqa: F401 - таблица users для внешнего ключа transactions.user_id
+from core.use_cases import billing
+
+PASSWORD = "bench-password"
+ENDPOINTS = ["get_appointments", "login", "balance", "predict_1", "predict_2"]
+
+_local = threading.local()
+
+
+def _session() -> requests.Session:
+    # Своя сессия (пул соединений keep-alive) на каждый поток
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
+
+def start_server(port: int, timeout: float = 120) -> subprocess.Popen:
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"])
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Сервер завершился с кодом {server.returncode}")
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/ready", timeout=1).status_code == 200:
+                return server
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("Сервер не стал готов за отведенное время")
+
+
+async def _top_up(user_ids: list[int], amount: float) -> None:
+    async with async_session_maker() as session:
+        for user_id in user_ids:
+            await billing.credit(session, user_id, amount)
+        await session.commit()
+    await engine.dispose()
+
+
+async def _schedule() -> list[tuple]:
+    # Дни и врачи, на которые в базе есть записи
+    async with async_session_maker() as session:
+        result = await session.execute(text("SELECT DISTINCT appointment_date, doctor_name FROM appointments"))
+        rows = result.all()
+    await engine.dispose()
+    if not rows:
+        raise RuntimeError("В базе нет записей, сначала выполните python -m benchmarks.seed --reset")
+    return sorted(rows)
+
+
+def prepare_users(base_url: str, users: int, credit: float) -> list[dict]:
+    # Регистрация (повторная дает 409 - пользователь остается прежним), вход и пополнение баланса
+    accounts = []
+    for i in range(users):
+        email = f"bench{i}@example.com"
+        requests.post(f"{base_url}/registration/", json={"email": email, "password": PASSWORD,
+                                                          "first_name": "Bench", "last_name": str(i)})
+        response = requests.post(f"{base_url}/login/", json={"email": email, "password": PASSWORD})
+        response.raise_for_status()
+        cookies = {"users_access_token": response.json()["access_token"]}
+        user_id = requests.get(f"{base_url}/me/", cookies=cookies).json()["user_id"]
+        accounts.append({"email": email, "user_id": user_id, "cookies": cookies})
+    asyncio.run(_top_up([account["user_id"] for account in accounts], credit))
+    return accounts
+
+
+def make_plan(n: int, accounts: list[dict], schedule: list[tuple], seed: int) -> list[tuple]:
+    # Одинаковая последовательность запросов при одинаковом seed
+    r = random.Random(seed)
+    plan = []
+    for _ in range(n):
+        endpoint = r.choice(ENDPOINTS)
+        account = r.choice(accounts)
+        day, doctor = r.choice(schedule)
+        plan.append((endpoint, account, day, doctor))
+    return plan
+
+
+def call(base_url: str, endpoint: str, account: dict, day, doctor: str) -> tuple[str, float, int]:
+    session = _session()
+    date = f"{day.day}/{day.month}/{day.year}"
+    start = time.perf_counter()
+    if endpoint == "get_appointments":
+        response = session.get(f"{base_url}/get_appointments/{date}", params={"doctor_name": doctor})
+    elif endpoint == "login":
+        response = session.post(f"{base_url}/login/", json={"email": account["email"], "password": PASSWORD})
+    elif endpoint == "balance":
+        response = session.get(f"{base_url}/balance/", cookies=account["cookies"])
+    else:
+        n_model = endpoint.rsplit("_", 1)[1]
+        response = session.get(f"{base_url}/predict/{date}/{doctor}/{n_model}", cookies=account["cookies"])
+    response.content
+    return endpoint, time.perf_counter() - start, response.status_code
+
+
+def percentile(timings: list[float], q: float) -> float:
+    return timings[min(len(timings) - 1, int(len(timings) * q))] * 1000
+
+
+def summarize(results: list[tuple], seconds: float) -> dict:
+    report = {}
+    for endpoint in ENDPOINTS:
+        timings = sorted(t for name, t, _ in results if name == endpoint)
+        if not timings:
+            continue
+        errors = sum(1 for name, _, code in results if name == endpoint and code >= 400)
+        report[endpoint] = {
+            "requests": len(timings), "errors": errors, "rps": round(len(timings) / seconds, 1),
+            "p50_ms": round(percentile(timings, 0.5), 2), "p95_ms": round(percentile(timings, 0.95), 2),
+            "p99_ms": round(percentile(timings, 0.99), 2), "mean_ms": round(statistics.fmean(timings) * 1000, 2),
+        }
+    return report
+
+
+def run(base_url: str, n: int, concurrency: int, users: int, credit: float, seed: int) -> dict:
+    accounts = prepare_users(base_url, users, credit)
+    plan = make_plan(n, accounts, asyncio.run(_schedule()), seed)
+
+    # Прогрев соединений и кэшей сервера не попадает в замеры
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(lambda item: call(base_url, *item), plan[:concurrency * 2]))
+        start = time.perf_counter()
+        results = list(pool.map(lambda item: call(base_url, *item), plan))
+        seconds = time.perf_counter() - start
+
+    report = {
+        "requests": n, "concurrency": concurrency, "users": users, "seed": seed,
+        "seconds": round(seconds, 2), "rps": round(n / seconds, 1),
+        "errors": sum(1 for _, _, code in results if code >= 400),
+        "endpoints": summarize(results, seconds),
+    }
+    for endpoint, stats in report["endpoints"].items():
+        print(f"{endpoint:17} {stats['requests']:>6} запросов, p50 {stats['p50_ms']:8.2f} мс, "
+              f"p99 {stats['p99_ms']:8.2f} мс, {stats['rps']:7.1f} rps, ошибок {stats['errors']}")
+    print(f"Всего: {report['rps']} rps, ошибок {report['errors']}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--base-url", help="Адрес запущенного сервера (по умолчанию сервер запускается здесь)")
+    parser.add_argument("--port", type=int, default=8765, help="Порт запускаемого сервера")
+    parser.add_argument("--requests", type=int, default=1000, help="Число запросов")
+    parser.add_argument("--concurrency", type=int, default=8, help="Одновременных запросов")
+    parser.add_argument("--users", type=int, default=8, help="Число пользователей")
+    parser.add_argument("--credit", type=float, default=1_000_000, help="Пополнение баланса каждого пользователя")
+    parser.add_argument("--seed", type=int, default=0, help="Seed последовательности запросов")
+    parser.add_argument("--output", help="Файл для JSON отчета")
+    args = parser.parse_args()
+
+    server = None if args.base_url else start_server(args.port)
+    base_url = args.base_url or f"http://127.0.0.1:{args.port}"
+    try:
+        report = run(base_url, args.requests, args.concurrency, args.users, args.credit, args.seed)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,52 @@
+"""
+Профиль импорта API: сколько стоит `import main` и какие модули тяжелее всего
+(по python -X importtime, в отдельном процессе с холодным sys.modules):
+    python -m benchmarks.import_profile --top 20 --output import_profile.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Модули ML, которые не должны загружаться при старте API
+HEAVY_MODULES = ["pandas", "sklearn", "category_encoders", "xgboost", "scipy"]
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def profile(module: str) -> dict:
+    code = f"import sys, json, {module}; print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+
+    # Строки вида "import time:  self [us] | cumulative | имя", вложенность - отступом имени
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line.split(":", 1)[1].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules.append({"module": name.strip(), "depth": depth,
+                        "self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000})
+
+    total_ms = sum(m["cumulative_ms"] for m in modules if m["depth"] == 0)
+    return {"module": module, "total_ms": round(total_ms, 1),
+            "heavy_loaded": json.loads(result.stdout), "modules": modules}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--module", default="main", help="Модуль, импорт которого профилируется")
+    parser.add_argument("--top", type=int, default=20, help="Сколько самых тяжелых модулей вывести")
+    parser.add_argument("--output", help="Файл для JSON отчета")
+    args = parser.parse_args()
+
+    report = profile(args.module)
+    print(f"import {report['module']}: {report['total_ms']:.0f} мс, "
+          f"тяжелые модули ML: {', '.join(report['heavy_loaded']) or 'не загружены'}")
+    for m in sorted(report["modules"], key=lambda m: m["cumulative_ms"], reverse=True)[:args.top]:
+        print(f"{m['cumulative_ms']:9.1f} мс  {'  ' * m['depth']}{m['module']}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,74 @@
+"""
+Микробенчмарки построения признаков и расчета моделей по размеру батча
+(без базы и HTTP, на синтетических строках), в том числе выгруженных моделей
+(models/scorer.py) против исходных пайплайнов на тех же признаках:
+    python -m benchmarks.micro --sizes 1 10 100 1000 10000 --output micro.json
+"""
+import argparse
+import json
+import statistics
+import time
+from core.use_cases.predict import FEATURE_ROW_COLUMNS
+from models.models import data_to_model, predict_model, rows_to_columns, features_frame
+from models.registry import registry, models_dict
+from models.scorer import ArrayScorer
+from benchmarks.synthetic import feature_rows
+
+
+def measure(func, min_seconds: float = 0.5, max_runs: int = 1000) -> dict:
+    # Повторяет func, пока не наберется min_seconds (но не больше max_runs раз)
+    func()  # прогрев
+    timings = []
+    start = time.perf_counter()
+    while len(timings) < max_runs and (time.perf_counter() - start < min_seconds or len(timings) < 3):
+        t = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - t)
+    timings.sort()
+    return {
+        "runs": len(timings),
+        "median_ms": statistics.median(timings) * 1000,
+        "min_ms": timings[0] * 1000,
+        "p99_ms": timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000,
+    }
+
+
+def run(sizes: list[int], min_seconds: float) -> dict:
+    registry.load_all(models_dict.values())
+    # Исходные пайплайны выгруженных моделей - для сравнения на тех же признаках
+    pipelines = {model: registry.load_pipeline(model) for model in models_dict.values()
+                 if isinstance(registry.get(model).estimator, ArrayScorer)}
+    results = []
+    for size in sizes:
+        data = rows_to_columns(feature_rows(size), FEATURE_ROW_COLUMNS)
+        cases = {"data_to_model": lambda: data_to_model(data)}
+        for model in models_dict.values():
+            cases[f"predict_model[{model}]"] = lambda model=model: predict_model(data, model)
+
+        # Выгруженная модель против исходного пайплайна на тех же признаках
+        numeric, categorical = data_to_model(data)
+        for model, pipeline in pipelines.items():
+            cases[f"scorer[{model}]"] = lambda scorer=registry.get(model).estimator: scorer.predict_proba(
+                numeric, categorical)
+            cases[f"pipeline[{model}]"] = lambda pipeline=pipeline: pipeline.predict_proba(
+                features_frame(numeric, categorical))
+
+        for name, func in cases.items():
+            result = {"name": name, "batch_size": size, **measure(func, min_seconds)}
+            result["us_per_row"] = result["median_ms"] * 1000 / size
+            results.append(result)
+            print(f"{name:32} {size:>7} строк: {result['median_ms']:9.3f} мс, {result['us_per_row']:8.2f} мкс/строка")
+    return {"models": registry.loaded(), "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 1000, 10000], help="Размеры батчей")
+    parser.add_argument("--min-seconds", type=float, default=0.5, help="Минимальное время замеров одного случая")
+    parser.add_argument("--output", help="Файл для JSON отчета")
+    args = parser.parse_args()
+
+    report = run(args.sizes, args.min_seconds)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
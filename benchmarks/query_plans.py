@@ -0,0 +1,122 @@
+"""
+Планы горячих запросов до и после индексов на синтетических данных.
+
+Данные создаются в отдельной схеме bench (рабочие таблицы не затрагиваются):
+    python -m benchmarks.query_plans --appointments 10000000
+"""
+import argparse
+import asyncio
+import json
+import time
+from sqlalchemy import text
+from config.database import engine
+
+SCHEMA = "bench"
+
+TABLES = """
+CREATE TABLE users (
+    user_id serial PRIMARY KEY, first_name varchar, last_name varchar,
+    hashed_password varchar, email varchar
+);
+CREATE TABLE appointments (
+    appointment_id integer PRIMARY KEY, doctor_name varchar, slot_id integer,
+    patient_id integer, scheduled_date date, appointment_date date
+);
+CREATE TABLE transactions (
+    transaction_id serial PRIMARY KEY, user_id integer NOT NULL,
+    amount numeric(10, 2) NOT NULL, status varchar NOT NULL
+);
+"""
+
+FILL = [
+    """INSERT INTO appointments
+       SELECT i, 'Врач ' || (i / 2000 % 200), i % 20, i % 1000000,
+              date '2020-01-01' + (i % 2000) - (i % 60), date '2020-01-01' + (i % 2000)
+       FROM generate_series(1, :appointments) AS i""",
+    """INSERT INTO users (first_name, last_name, hashed_password, email)
+       SELECT 'Имя', 'Фамилия', 'x', 'user' || i || '@example.com'
+       FROM generate_series(1, :users) AS i""",
+    """INSERT INTO transactions (user_id, amount, status)
+       SELECT 1 + i % :users, CASE WHEN i <= :users THEN 100 ELSE -5 END,
+              (ARRAY['completed', 'completed', 'completed', 'pending', 'failed'])[1 + i % 5]
+       FROM generate_series(1, :transactions) AS i""",
+]
+
+INDEXES = [
+    "CREATE INDEX ix_appointments_appointment_date_doctor_name ON appointments (appointment_date, doctor_name)",
+    "CREATE UNIQUE INDEX ix_users_email ON users (email)",
+    "CREATE INDEX ix_transactions_user_id_status ON transactions (user_id, status)",
+]
+
+QUERIES = {
+    "appointments by date and doctor":
+        "SELECT * FROM appointments WHERE appointment_date = date '2023-05-15' AND doctor_name = 'Врач 17'",
+    "user by email":
+        "SELECT * FROM users WHERE email = 'user4242@example.com'",
+    "ledger balance":
+        "SELECT coalesce(sum(amount), 0) FROM transactions WHERE user_id = 4242 AND status IN ('completed', 'pending')",
+}
+
+
+async def explain(conn) -> dict:
+    plans = {}
+    for name, query in QUERIES.items():
+        result = await conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query}"))
+        plan = result.scalar()[0]
+        plans[name] = {
+            "node": plan["Plan"]["Node Type"],
+            "index": plan["Plan"].get("Index Name"),
+            "execution_ms": plan["Execution Time"],
+            "shared_blocks": plan["Plan"].get("Shared Hit Blocks", 0) + plan["Plan"].get("Shared Read Blocks", 0),
+        }
+        result = await conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {query}"))
+        print(f"--- {name}\n" + "\n".join(row[0] for row in result))
+    return plans
+
+
+async def main(appointments: int, output: str | None):
+    params = {"appointments": appointments, "users": max(appointments // 10, 1),
+              "transactions": max(appointments // 2, 1)}
+    async with engine.connect() as conn:
+        await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        await conn.execute(text(f"SET search_path TO {SCHEMA}"))
+        for statement in TABLES.split(";"):
+            if statement.strip():
+                await conn.execute(text(statement))
+
+        start = time.perf_counter()
+        for statement in FILL:
+            await conn.execute(text(statement), params)
+        await conn.execute(text("ANALYZE"))
+        await conn.commit()
+        print(f"Синтетические данные {params} загружены за {time.perf_counter() - start:.1f} с")
+
+        print("\n===== До индексов =====")
+        before = await explain(conn)
+
+        for statement in INDEXES:
+            await conn.execute(text(statement))
+        await conn.execute(text("ANALYZE"))
+        await conn.commit()
+
+        print("\n===== После индексов =====")
+        after = await explain(conn)
+
+        await conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+        await conn.commit()
+    await engine.dispose()
+
+    report = {"params": params, "before": before, "after": after}
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--appointments", type=int, default=10_000_000, help="Число синтетических записей")
+    parser.add_argument("--output", help="Файл для JSON отчета")
+    args = parser.parse_args()
+    asyncio.run(main(args.appointments, args.output))
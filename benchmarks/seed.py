@@ -0,0 +1,76 @@
+"""
+Заполнение рабочих таблиц patients и appointments синтетическими данными для
+нагрузочных тестов (база должна быть создана миграциями). Данные генерируются
+на стороне Postgres и повторяются при одинаковом --seed. Таблицы предварительно
+очищаются, поэтому запуск требует явного --reset:
+    python -m benchmarks.seed --reset --appointments 1000000 --doctors 200 --days 365
+"""
+import argparse
+import asyncio
+import time
+from sqlalchemy import text
+from config.database import engine
+from benchmarks.synthetic import DOCTORS, NEIGHBOURHOODS, START_DATE
+
+FILL = [
+    """INSERT INTO patients
+       SELECT i, (ARRAY['F', 'M'])[1 + floor(random() * 2)::int], floor(random() * 96)::int,
+              (CAST(:neighbourhoods AS text[]))[1 + floor(random() * cardinality(CAST(:neighbourhoods AS text[])))::int],
+              random() < 0.1, random() < 0.2, random() < 0.07, random() < 0.03, random() < 0.02, random() < 0.3,
+              0, 0, 0
+       FROM generate_series(1, :patients) AS i""",
+    # Счетчики истории: cumsum <= cumcount, доля в процентах, как в исходных данных
+    """UPDATE patients SET appointment_cumcount = floor(random() * 11)::int""",
+    """UPDATE patients SET no_show_cumsum = floor(random() * (appointment_cumcount + 1))::int,
+                          no_show_ratio = 0""",
+    """UPDATE patients SET no_show_ratio = no_show_cumsum * 100.0 / appointment_cumcount
+       WHERE appointment_cumcount > 0""",
+    # Записи: по slots_per_day на врача в день, подряд по дням начиная с START_DATE
+    """INSERT INTO appointments
+       SELECT i,
+              CASE WHEN d < cardinality(CAST(:doctor_names AS text[])) THEN (CAST(:doctor_names AS text[]))[d + 1] ELSE 'Врач ' || d END,
+              i % :slots + 1, 1 + floor(random() * :patients)::bigint,
+              day - floor(random() * 60)::int, day
+       FROM generate_series(0, :appointments - 1) AS i,
+            LATERAL (SELECT (i / :slots) % :doctors AS d,
+                            CAST(:start_date AS date) + (i / (:slots * :doctors)) % :days AS day) AS slot""",
+]
+
+
+async def seed(appointments: int, patients: int, doctors: int, days: int, seed_value: float) -> dict:
+    slots = max(appointments // (doctors * days), 1)
+    params = {"appointments": appointments, "patients": patients, "doctors": doctors, "days": days,
+              "slots": slots, "start_date": START_DATE, "doctor_names": DOCTORS, "neighbourhoods": NEIGHBOURHOODS}
+    start = time.perf_counter()
+    async with engine.begin() as conn:
+        await conn.execute(text("TRUNCATE appointments, patients, predictions"))
+        await conn.execute(text("SELECT setseed(:seed)"), {"seed": seed_value})
+        for statement in FILL:
+            await conn.execute(text(statement), params)
+    async with engine.connect() as conn:
+        await conn.execute(text("COMMIT"))
+        await conn.execute(text("ANALYZE patients"))
+        await conn.execute(text("ANALYZE appointments"))
+    await engine.dispose()
+
+    report = {"appointments": appointments, "patients": patients, "doctors": doctors, "days": days,
+              "slots_per_day": slots, "start_date": START_DATE.isoformat(),
+              "seconds": round(time.perf_counter() - start, 1)}
+    print(report)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--reset", action="store_true", help="Подтверждение очистки patients/appointments/predictions")
+    parser.add_argument("--appointments", type=int, default=100_000, help="Число записей")
+    parser.add_argument("--patients", type=int, help="Число пациентов (по умолчанию appointments / 3)")
+    parser.add_argument("--doctors", type=int, default=20, help="Число врачей")
+    parser.add_argument("--days", type=int, default=30, help="Число дней приема")
+    parser.add_argument("--seed", type=float, default=0.42, help="setseed() для воспроизводимости, от -1 до 1")
+    args = parser.parse_args()
+    if not args.reset:
+        parser.error("таблицы будут очищены, подтвердите флагом --reset")
+
+    asyncio.run(seed(args.appointments, args.patients or max(args.appointments // 3, 1),
+                     args.doctors, args.days, args.seed))
@@ -0,0 +1,61 @@
+"""
+Бенчмарк кодирования ответов в JSON: прежний путь FastAPI (проверка каждой
+строки через pydantic / jsonable_encoder, затем json.dumps) против orjson
+(core/use_cases/serialization.py), время в пересчете на 10 тысяч строк:
+    python -m benchmarks.serialization --rows 10000 --output serialization.json
+"""
+import argparse
+import json
+from collections import namedtuple
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from core.entities import Appointment
+from core.use_cases.predict import APPOINTMENT_COLUMNS, stored_record
+from core.use_cases.serialization import rows_to_dicts, json_response, ndjson_lines
+from benchmarks.micro import measure
+from benchmarks.synthetic import feature_rows
+
+PER_ROWS = 10000
+
+
+def run(n: int, min_seconds: float) -> dict:
+    # Строки запроса с доступом к колонкам по имени, как у Row SQLAlchemy
+    Row = namedtuple("Row", list(Appointment.AppointmentInDB.model_fields))
+    rows = [Row(*row[:len(APPOINTMENT_COLUMNS)]) for row in feature_rows(n)]
+    records = [stored_record(row, 0.5 + i % 1000 / 2000, "Прием") for i, row in enumerate(rows)]
+    adapter = TypeAdapter(list[Appointment.AppointmentInDB])
+
+    cases = {
+        # Как FastAPI с response_model: проверка строк, выгрузка в JSON-совместимые объекты, json.dumps
+        "appointments.pydantic": lambda: JSONResponse(
+            adapter.dump_python(adapter.validate_python(rows, from_attributes=True), mode="json")).body,
+        "appointments.orjson": lambda: json_response(rows_to_dicts(rows, Appointment.AppointmentInDB)).body,
+        "appointments.ndjson.pydantic": lambda: "".join(
+            Appointment.AppointmentInDB.model_validate(row).model_dump_json() + "\n" for row in rows).encode(),
+        "appointments.ndjson.orjson": lambda: ndjson_lines(rows_to_dicts(rows, Appointment.AppointmentInDB)),
+        # Прогнозы без response_model: jsonable_encoder, затем json.dumps
+        "predictions.jsonable_encoder": lambda: JSONResponse(jsonable_encoder(records)).body,
+        "predictions.orjson": lambda: json_response(records).body,
+    }
+
+    results = []
+    for name, func in cases.items():
+        result = {"name": name, "rows": n, **measure(func, min_seconds)}
+        result["ms_per_10k_rows"] = result["median_ms"] * PER_ROWS / n
+        results.append(result)
+        print(f"{name:32} {n:>7} строк: {result['median_ms']:9.3f} мс, {result['ms_per_10k_rows']:8.2f} мс/10k строк")
+    return {"results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=PER_ROWS, help="Строк в ответе")
+    parser.add_argument("--min-seconds", type=float, default=0.5, help="Минимальное время замеров одного случая")
+    parser.add_argument("--output", help="Файл для JSON отчета")
+    args = parser.parse_args()
+
+    report = run(args.rows, args.min_seconds)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,31 @@
+"""Синтетические данные для бенчмарков: одинаковые при одинаковом seed."""
+import datetime
+import random
+
+DOCTORS = ["Иванов А.В.", "Смирнов О.П.", "Петров И.М.", "Соколов Д.Н.", "Васильев Е.С."]
+NEIGHBOURHOODS = ["JARDIM CAMBURI", "MARIA ORTIZ", "RESISTÊNCIA", "JARDIM DA PENHA", "ITARARÉ", "CENTRO",
+                  "SANTA MARTHA", "TABUAZEIRO", "JESUS DE NAZARETH", "BONFIM"]
+START_DATE = datetime.date(2025, 4, 29)
+
+
+def doctor_name(i: int) -> str:
+    # Первые врачи - с реальными фамилиями, дальше нумерованные
+    return DOCTORS[i] if i < len(DOCTORS) else f"Врач {i}"
+
+
+def feature_rows(n: int, seed: int = 0) -> list[tuple]:
+    # Строки в формате feature_rows_query (колонки FEATURE_ROW_COLUMNS из core.use_cases.predict)
+    r = random.Random(seed)
+    rows = []
+    for i in range(n):
+        appointment_count = r.randint(0, 10)
+        no_shows = r.randint(0, appointment_count)
+        rows.append((
+            doctor_name(i % len(DOCTORS)), i % 20 + 1, 1_000_000 + i, 5_000_000 + i,
+            START_DATE, START_DATE - datetime.timedelta(days=r.randint(0, 60)),
+            r.choice(["F", "M"]), r.randint(0, 95), r.choice(NEIGHBOURHOODS),
+            r.random() < 0.1, r.random() < 0.2, r.random() < 0.07, r.random() < 0.03, r.random() < 0.02,
+            r.random() < 0.3, no_shows, appointment_count,
+            no_shows / appointment_count * 100 if appointment_count else 0.0,
+        ))
+    return rows
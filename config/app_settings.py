@@ -0,0 +1,44 @@
+import os
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+# Корень проекта (/code в образе docker)
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class AppSettings(BaseSettings):
+    PREDICTION_CACHE_SIZE: int = 100_000    # Максимальное число закэшированных прогнозов (по записям)
+    PREDICTION_CACHE_TTL: int = 60*60       # Время жизни прогноза в кэше, секунд
+    PREDICT_STREAM_CHUNK_SIZE: int = 5_000  # Записей в одной порции потокового прогноза
+
+    INFERENCE_WORKERS: int = 2              # Процессов для расчета моделей (0 - в потоке основного процесса)
+    INFERENCE_MAX_BATCH: int = 5_000        # Строк в одном вызове модели, при наборе батч считается сразу
+    INFERENCE_MAX_WAIT_MS: float = 5        # Сколько ждать другие запросы к той же модели, мс
+
+    PREDICTION_PRECOMPUTE_HOUR: int = 2     # Час ночного расчета прогнозов (-1 - выключено)
+    PREDICTION_HORIZON_DAYS: int = 1        # На сколько дней вперед от сегодняшнего считать прогнозы
+
+    PASSWORD_HASH_WORKERS: int = 4          # Потоков для bcrypt (одновременно хэшируемых паролей)
+    PASSWORD_HASH_MAX_QUEUE: int = 64       # Сколько операций может ждать в очереди, сверх - 503
+    BCRYPT_ROUNDS: int = 12                 # Стоимость bcrypt для новых хэшей
+    PASSWORD_REHASH_ON_LOGIN: bool = False  # Перехэшировать при входе пароли с устаревшей стоимостью
+
+    USER_CACHE_SIZE: int = 10_000           # Пользователей в кэше get_current_user
+    USER_CACHE_TTL: int = 60                # Время жизни пользователя в кэше, секунд
+    TOKEN_CACHE_SIZE: int = 10_000          # Декодированных JWT в кэше
+    TOKEN_CACHE_TTL: int = 5*60             # Время жизни декодированного JWT в кэше, секунд
+
+    BALANCE_RECONCILE_INTERVAL: int = 60*60 # Период сверки балансов с журналом транзакций, секунд (0 - выключено)
+    BILLING_PENDING_TIMEOUT: int = 60*60    # Резерв без итога дольше этого возвращается при сверке, секунд
+    # Каталог журналов итогов списаний, должен переживать перезапуск (в docker-compose - том billing_journal)
+    BILLING_JOURNAL_DIR: str = os.path.join(PROJECT_DIR, "billing_journal")
+    BILLING_MAX_BATCH: int = 1_000          # Итогов списаний в одной групповой записи в БД
+    PATIENT_FEATURES_INTERVAL: int = 60*60  # Период учета новых исходов приемов в признаках пациентов, секунд (0 - выключено)
+
+    SLOW_REQUEST_MS: float = 0              # Порог для лога медленных запросов с разбивкой по этапам, мс (0 - выключено)
+
+    model_config = SettingsConfigDict(
+        env_file=os.path.join(os.path.dirname(__file__), "app.env"),
+        extra="ignore"
+    )
+
+# Создаем и загружаем настройки
+settings = AppSettings()
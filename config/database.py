@@ -1,16 +1,81 @@
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime
 from typing import Annotated
-from sqlalchemy import func
+from sqlalchemy import func, text
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncAttrs
 from sqlalchemy.orm import DeclarativeBase, declared_attr
-from config.db_settings import get_db_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from config.db_settings import get_db_url, get_engine_options
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Пул соединений, который считает время ожидания свободного соединения."""
+
+    checkouts = 0
+    checkout_wait_total = 0.0
+    checkout_wait_max = 0.0
+    timeouts = 0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            TimedQueuePool.timeouts += 1
+            raise
+        finally:
+            wait = time.perf_counter() - start
+            TimedQueuePool.checkouts += 1
+            TimedQueuePool.checkout_wait_total += wait
+            TimedQueuePool.checkout_wait_max = max(TimedQueuePool.checkout_wait_max, wait)
 
 
 DATABASE_URL = get_db_url()
-engine = create_async_engine(DATABASE_URL)
+engine = create_async_engine(DATABASE_URL, poolclass=TimedQueuePool, **get_engine_options())
 async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
 
 
+async def get_session():
+    # Одна сессия на запрос: зависимость кэшируется FastAPI в пределах запроса
+    async with async_session_maker() as session:
+        yield session
+
+
+@asynccontextmanager
+async def try_advisory_lock(name: str):
+    """
+    Сессионная advisory-блокировка Postgres по имени задачи: отдает True, если
+    блокировка взята, и False, если ее держит другой процесс (воркер uvicorn).
+    Соединение с блокировкой занято до выхода из блока; при обрыве соединения
+    Postgres снимает блокировку сам.
+    """
+    async with engine.connect() as conn:
+        locked = (await conn.execute(text("SELECT pg_try_advisory_lock(hashtext(:name))"), {"name": name})).scalar()
+        # Блокировка живет в сессии, а не в транзакции: соединение не висит idle in transaction
+        await conn.commit()
+        try:
+            yield locked
+        finally:
+            if locked:
+                await conn.execute(text("SELECT pg_advisory_unlock(hashtext(:name))"), {"name": name})
+                await conn.commit()
+
+
+def pool_stats() -> dict:
+    pool = engine.sync_engine.pool
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "checkouts": TimedQueuePool.checkouts,
+        "checkout_wait_avg": TimedQueuePool.checkout_wait_total / TimedQueuePool.checkouts if TimedQueuePool.checkouts else 0.0,
+        "checkout_wait_max": TimedQueuePool.checkout_wait_max,
+        "timeouts": TimedQueuePool.timeouts,
+    }
+
+
 class Base(AsyncAttrs, DeclarativeBase):
     __abstract__ = True
 
@@ -18,4 +83,3 @@ class Base(AsyncAttrs, DeclarativeBase):
     def __tablename__(cls) -> str:
         return f"{cls.__name__.lower()}s"
     
-    
\ No newline at end of file
@@ -13,14 +13,21 @@ class AppointmentInDB(BaseModel):
         "from_attributes": True
     }
 
-from sqlalchemy import Column, Integer, Date, String
+from sqlalchemy import Column, Integer, BigInteger, Date, String, Index
 from config.database import Base
 
 class Appointment(Base):
+    # Записи выбираются по дню приема и врачу (get_appointments, get_predict),
+    # по пациенту - в триггере версий расписания при изменении пациентов
+    __table_args__ = (
+        Index("ix_appointments_appointment_date_doctor_name", "appointment_date", "doctor_name"),
+        Index("ix_appointments_patient_id", "patient_id"),
+    )
+
     appointment_id = Column(Integer, primary_key=True)
     doctor_name = Column(String)
     slot_id = Column(Integer)
-    patient_id = Column(Integer)
+    patient_id = Column(BigInteger)
     scheduled_date = Column(Date)
     appointment_date = Column(Date)
 
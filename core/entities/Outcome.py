@@ -0,0 +1,57 @@
+from pydantic import BaseModel
+from datetime import date
+from sqlalchemy import Column, Integer, BigInteger, Boolean, Date, String
+from config.database import Base
+
+
+class OutcomeIn(BaseModel):
+    appointment_id: int
+    patient_id: int
+    appointment_date: date    # Дата приема
+    no_show: bool             # Пациент не пришел на прием
+
+    model_config = {
+        "from_attributes": True
+    }
+
+
+# Исход приема: пришел пациент или нет. Строки только добавляются,
+# outcome_id растет монотонно и служит позицией для инкрементального пересчета признаков
+class Outcome(Base):
+    outcome_id = Column(BigInteger, primary_key=True)
+    appointment_id = Column(Integer, unique=True, nullable=False)
+    patient_id = Column(BigInteger, nullable=False)
+    appointment_date = Column(Date, nullable=False)
+    no_show = Column(Boolean, nullable=False)
+
+    def __repr__(self):
+        return (f"{self.__class__.__name__}(id={self.outcome_id})")
+    
+    def __str__(self):
+        return (f"{self.__class__.__name__}(id={self.outcome_id}")
+
+
+# До какого outcome_id исходы уже учтены в признаках пациентов
+class Watermark(Base):
+    name = Column(String, primary_key=True)
+    last_id = Column(BigInteger, default=0, nullable=False)
+
+    def __repr__(self):
+        return (f"{self.__class__.__name__}(name={self.name})")
+    
+    def __str__(self):
+        return (f"{self.__class__.__name__}(name={self.name}")
+
+
+# Исход пациента, которого еще не было в patients, когда позиция прошла его outcome_id:
+# учитывается при первом пересчете после появления пациента
+class PendingOutcome(Base):
+    __tablename__ = "pending_outcomes"
+
+    outcome_id = Column(BigInteger, primary_key=True)
+
+    def __repr__(self):
+        return (f"{self.__class__.__name__}(id={self.outcome_id})")
+    
+    def __str__(self):
+        return (f"{self.__class__.__name__}(id={self.outcome_id}")
@@ -20,11 +20,11 @@ class PatientInDB(BaseModel):
     }
 
 
-from sqlalchemy import Column, Integer, String, Float, Boolean
+from sqlalchemy import Column, Integer, BigInteger, String, Float, Boolean
 from config.database import Base
 
 class Patient(Base):
-    patient_id = Column(Integer, primary_key=True)  
+    patient_id = Column(BigInteger, primary_key=True)  # id из внешней системы не помещаются в int4
     gender = Column(String)
     age = Column(Integer)
     neighbourhood = Column(String)
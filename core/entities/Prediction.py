@@ -0,0 +1,51 @@
+from pydantic import BaseModel, Field
+from datetime import date, datetime
+
+# Один элемент пакетного запроса: диапазон дат, список врачей и модель
+class PredictBatchItem(BaseModel):
+    date_from: date                 # Первая дата приема
+    date_to: date | None = None     # Последняя дата приема включительно (по умолчанию = date_from)
+    doctor_names: list[str] = Field(min_length=1)
+    n_model: int = 1
+
+class PredictBatchRequest(BaseModel):
+    items: list[PredictBatchItem] = Field(min_length=1)
+
+# Прогноз по одной записи
+class PredictionOut(BaseModel):
+    doctor_name: str
+    slot_id: int
+    patient_id: int
+    appointment_id: int
+    appointment_date: datetime
+    scheduled_date: datetime
+    probability_visit: float        # Вероятность явки
+    predict_visit: str              # "Прием" или "Пропуск"
+
+# Прогнозы, сгруппированные по врачу, дню и модели
+class PredictBatchGroup(BaseModel):
+    doctor_name: str
+    appointment_date: date
+    n_model: int
+    predictions: list[PredictionOut]
+
+
+from sqlalchemy import Column, Integer, Float, String, LargeBinary, DateTime, func
+from config.database import Base
+
+# Прогноз, рассчитанный заранее (ночной пересчет). Действителен, пока совпадают
+# версия файла модели и отпечаток признаков записи и пациента
+class Prediction(Base):
+    appointment_id = Column(Integer, primary_key=True)
+    model = Column(String, primary_key=True)            # имя файла модели
+    model_version = Column(String, nullable=False)
+    fingerprint = Column(LargeBinary, nullable=False)   # row_fingerprint строки признаков
+    probability_visit = Column(Float, nullable=False)
+    predict_visit = Column(String, nullable=False)
+    computed_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+    def __repr__(self):
+        return (f"{self.__class__.__name__}(id={self.appointment_id}, model={self.model})")
+    
+    def __str__(self):
+        return (f"{self.__class__.__name__}(id={self.appointment_id}, model={self.model}")
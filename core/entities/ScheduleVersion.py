@@ -0,0 +1,18 @@
+from sqlalchemy import Column, BigInteger, Date, String
+from config.database import Base
+
+# Версия расписания врача на день. Увеличивается триггерами БД при любом изменении
+# записей этого дня или пациентов, записанных на него (миграция b5e1c9d4f372);
+# из версий строятся ETag для get_appointments и get_predict
+class ScheduleVersion(Base):
+    __tablename__ = "schedule_versions"
+
+    appointment_date = Column(Date, primary_key=True)
+    doctor_name = Column(String, primary_key=True)
+    version = Column(BigInteger, nullable=False)    # из последовательности schedule_version_seq
+
+    def __repr__(self):
+        return (f"{self.__class__.__name__}(date={self.appointment_date}, doctor={self.doctor_name})")
+    
+    def __str__(self):
+        return (f"{self.__class__.__name__}(date={self.appointment_date}, doctor={self.doctor_name}")
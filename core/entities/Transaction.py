@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from sqlalchemy import Column, Integer, ForeignKey, Numeric, String
+from sqlalchemy import Column, Integer, ForeignKey, Numeric, String, DateTime, Index, func, text
 from config.database import Base
 
 
@@ -14,13 +14,34 @@ class WalletInDB(BaseModel):
 
 
 class Transaction(Base):
+    # Баланс по журналу считается по пользователю и статусу;
+    # резервы без итога ищутся сверкой по времени создания
+    __table_args__ = (
+        Index("ix_transactions_user_id_status", "user_id", "status"),
+        Index("ix_transactions_pending_created_at", "created_at", postgresql_where=text("status = 'pending'")),
+    )
+
     transaction_id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey("users.user_id"), unique=True)
+    user_id = Column(Integer, ForeignKey("users.user_id"))   # у пользователя много транзакций (журнал)
     amount = Column(Numeric(10, 2), default=0, nullable=False)
     status = Column(String, nullable=False)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
 
     def __repr__(self):
         return (f"{self.__class__.__name__}(id={self.transaction_id})")
     
     def __str__(self):
-        return (f"{self.__class__.__name__}(id={self.transaction_id}")
\ No newline at end of file
+        return (f"{self.__class__.__name__}(id={self.transaction_id}")
+
+
+# Текущий баланс пользователя: поддерживается вместе с транзакциями,
+# равен сумме транзакций в статусах completed и pending
+class Wallet(Base):
+    user_id = Column(Integer, ForeignKey("users.user_id"), primary_key=True)
+    balance = Column(Numeric(10, 2), default=0, nullable=False)
+
+    def __repr__(self):
+        return (f"{self.__class__.__name__}(id={self.user_id})")
+    
+    def __str__(self):
+        return (f"{self.__class__.__name__}(id={self.user_id}")
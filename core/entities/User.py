@@ -34,7 +34,7 @@ class User(Base):
     first_name = Column(String)
     last_name = Column(String)
     hashed_password = Column(String)
-    email = Column(String)
+    email = Column(String, unique=True, index=True)
 
     def __repr__(self):
         return (f"{self.__class__.__name__}(id={self.user_id})")
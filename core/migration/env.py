@@ -17,6 +17,12 @@ sys.path.insert(0, dirname(dirname(abspath(__file__))))
 
 from config.database import DATABASE_URL, Base
 from core.entities.Appointment import Appointment
+from core.entities.Patient import Patient
+from core.entities.User import User
+from core.entities.Transaction import Transaction, Wallet
+from core.entities.Outcome import Outcome, Watermark, PendingOutcome
+from core.entities.Prediction import Prediction
+from core.entities.ScheduleVersion import ScheduleVersion
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
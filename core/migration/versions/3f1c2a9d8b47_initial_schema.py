@@ -0,0 +1,72 @@
+"""initial schema
+
+Revision ID: 3f1c2a9d8b47
+Revises: 
+Create Date: 2025-05-20 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c2a9d8b47'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('users',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('first_name', sa.String(), nullable=True),
+    sa.Column('last_name', sa.String(), nullable=True),
+    sa.Column('hashed_password', sa.String(), nullable=True),
+    sa.Column('email', sa.String(), nullable=True),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_table('patients',
+    sa.Column('patient_id', sa.Integer(), nullable=False),
+    sa.Column('gender', sa.String(), nullable=True),
+    sa.Column('age', sa.Integer(), nullable=True),
+    sa.Column('neighbourhood', sa.String(), nullable=True),
+    sa.Column('scholarship', sa.Boolean(), nullable=True),
+    sa.Column('hipertension', sa.Boolean(), nullable=True),
+    sa.Column('diabetes', sa.Boolean(), nullable=True),
+    sa.Column('alcoholism', sa.Boolean(), nullable=True),
+    sa.Column('handcap', sa.Boolean(), nullable=True),
+    sa.Column('sms_received', sa.Boolean(), nullable=True),
+    sa.Column('no_show_cumsum', sa.Integer(), nullable=True),
+    sa.Column('appointment_cumcount', sa.Integer(), nullable=True),
+    sa.Column('no_show_ratio', sa.Float(), nullable=True),
+    sa.PrimaryKeyConstraint('patient_id')
+    )
+    op.create_table('appointments',
+    sa.Column('appointment_id', sa.Integer(), nullable=False),
+    sa.Column('doctor_name', sa.String(), nullable=True),
+    sa.Column('slot_id', sa.Integer(), nullable=True),
+    sa.Column('patient_id', sa.Integer(), nullable=True),
+    sa.Column('scheduled_date', sa.Date(), nullable=True),
+    sa.Column('appointment_date', sa.Date(), nullable=True),
+    sa.PrimaryKeyConstraint('appointment_id')
+    )
+    op.create_table('transactions',
+    sa.Column('transaction_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('amount', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('transaction_id'),
+    sa.UniqueConstraint('user_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('transactions')
+    op.drop_table('appointments')
+    op.drop_table('patients')
+    op.drop_table('users')
@@ -0,0 +1,43 @@
+"""wallets: materialized user balance
+
+Revision ID: 5b8e0d4c7a12
+Revises: 3f1c2a9d8b47
+Create Date: 2025-05-20 10:05:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b8e0d4c7a12'
+down_revision: Union[str, None] = '3f1c2a9d8b47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Журнал транзакций: у пользователя пополнения и по транзакции на каждое списание
+    op.drop_constraint('transactions_user_id_key', 'transactions', type_='unique')
+    op.create_table('wallets',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('balance', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    # Начальные балансы по журналу транзакций
+    op.execute("""
+        INSERT INTO wallets (user_id, balance)
+        SELECT u.user_id, COALESCE(SUM(t.amount) FILTER (WHERE t.status IN ('completed', 'pending')), 0)
+        FROM users u LEFT JOIN transactions t ON t.user_id = u.user_id
+        GROUP BY u.user_id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('wallets')
+    op.create_unique_constraint('transactions_user_id_key', 'transactions', ['user_id'])
@@ -0,0 +1,42 @@
+"""outcomes and feature watermark
+
+Revision ID: 6e2a9f4c1b85
+Revises: d41e7b2f9a63
+Create Date: 2025-05-20 10:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6e2a9f4c1b85'
+down_revision: Union[str, None] = 'd41e7b2f9a63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('outcomes',
+    sa.Column('outcome_id', sa.BigInteger(), nullable=False),
+    sa.Column('appointment_id', sa.Integer(), nullable=False),
+    sa.Column('patient_id', sa.BigInteger(), nullable=False),
+    sa.Column('appointment_date', sa.Date(), nullable=False),
+    sa.Column('no_show', sa.Boolean(), nullable=False),
+    sa.PrimaryKeyConstraint('outcome_id'),
+    sa.UniqueConstraint('appointment_id')
+    )
+    op.create_table('watermarks',
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('last_id', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('watermarks')
+    op.drop_table('outcomes')
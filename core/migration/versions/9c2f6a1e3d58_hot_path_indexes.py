@@ -0,0 +1,38 @@
+"""indexes for hot query predicates
+
+Revision ID: 9c2f6a1e3d58
+Revises: 5b8e0d4c7a12
+Create Date: 2025-05-20 10:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c2f6a1e3d58'
+down_revision: Union[str, None] = '5b8e0d4c7a12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY не блокирует запись в большие таблицы, но не работает внутри транзакции
+    with op.get_context().autocommit_block():
+        op.create_index('ix_appointments_appointment_date_doctor_name', 'appointments',
+                        ['appointment_date', 'doctor_name'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_users_email', 'users', ['email'], unique=True, postgresql_concurrently=True)
+        op.create_index('ix_transactions_user_id_status', 'transactions',
+                        ['user_id', 'status'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_transactions_user_id_status', table_name='transactions', postgresql_concurrently=True)
+        op.drop_index('ix_users_email', table_name='users', postgresql_concurrently=True)
+        op.drop_index('ix_appointments_appointment_date_doctor_name', table_name='appointments',
+                      postgresql_concurrently=True)
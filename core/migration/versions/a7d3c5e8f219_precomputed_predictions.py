@@ -0,0 +1,37 @@
+"""precomputed predictions
+
+Revision ID: a7d3c5e8f219
+Revises: 6e2a9f4c1b85
+Create Date: 2025-05-20 10:25:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d3c5e8f219'
+down_revision: Union[str, None] = '6e2a9f4c1b85'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('predictions',
+    sa.Column('appointment_id', sa.Integer(), nullable=False),
+    sa.Column('model', sa.String(), nullable=False),
+    sa.Column('model_version', sa.String(), nullable=False),
+    sa.Column('fingerprint', sa.LargeBinary(), nullable=False),
+    sa.Column('probability_visit', sa.Float(), nullable=False),
+    sa.Column('predict_visit', sa.String(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('appointment_id', 'model')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('predictions')
@@ -0,0 +1,154 @@
+"""schedule versions for conditional GET
+
+Revision ID: b5e1c9d4f372
+Revises: a7d3c5e8f219
+Create Date: 2025-05-20 10:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5e1c9d4f372'
+down_revision: Union[str, None] = 'a7d3c5e8f219'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Новая версия - следующее значение общей последовательности, поэтому версия
+# дня не повторяется даже после очистки таблицы. Ключи сортируются, чтобы
+# параллельные пакетные изменения блокировали строки в одном порядке
+BUMP = """
+CREATE FUNCTION schedule_versions_bump(dates date[], doctors varchar[]) RETURNS void LANGUAGE sql AS $$
+    INSERT INTO schedule_versions (appointment_date, doctor_name, version)
+    SELECT d, n, nextval('schedule_version_seq')
+    FROM (SELECT DISTINCT d, n FROM unnest(dates, doctors) AS k(d, n)
+          WHERE d IS NOT NULL AND n IS NOT NULL ORDER BY d, n) AS k
+    ON CONFLICT (appointment_date, doctor_name) DO UPDATE SET version = EXCLUDED.version
+$$
+"""
+
+# Триггеры уровня оператора: пакетная загрузка и пересчет признаков поднимают
+# версию каждого затронутого дня один раз за оператор. UPDATE без фактических
+# изменений (повторная загрузка тех же данных) версию не меняет
+ON_APPOINTMENTS = """
+CREATE FUNCTION schedule_versions_on_appointments() RETURNS trigger LANGUAGE plpgsql AS $$
+DECLARE
+    dates date[];
+    doctors varchar[];
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        UPDATE schedule_versions SET version = nextval('schedule_version_seq');
+        RETURN NULL;
+    ELSIF TG_OP = 'INSERT' THEN
+        SELECT array_agg(appointment_date), array_agg(doctor_name) INTO dates, doctors
+        FROM (SELECT DISTINCT appointment_date, doctor_name FROM new_rows) AS k;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(appointment_date), array_agg(doctor_name) INTO dates, doctors
+        FROM (SELECT DISTINCT appointment_date, doctor_name FROM old_rows) AS k;
+    ELSE
+        SELECT array_agg(appointment_date), array_agg(doctor_name) INTO dates, doctors
+        FROM (SELECT appointment_date, doctor_name FROM (SELECT * FROM old_rows EXCEPT SELECT * FROM new_rows) AS o
+              UNION
+              SELECT appointment_date, doctor_name FROM (SELECT * FROM new_rows EXCEPT SELECT * FROM old_rows) AS n) AS k;
+    END IF;
+    IF dates IS NOT NULL THEN
+        PERFORM schedule_versions_bump(dates, doctors);
+    END IF;
+    RETURN NULL;
+END
+$$
+"""
+
+# Пациент входит в ответ get_predict (признаки), поэтому его изменение
+# поднимает версии всех дней, на которые он записан
+ON_PATIENTS = """
+CREATE FUNCTION schedule_versions_on_patients() RETURNS trigger LANGUAGE plpgsql AS $$
+DECLARE
+    changed bigint[];
+    dates date[];
+    doctors varchar[];
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        UPDATE schedule_versions SET version = nextval('schedule_version_seq');
+        RETURN NULL;
+    ELSIF TG_OP = 'INSERT' THEN
+        changed := ARRAY(SELECT patient_id FROM new_rows);
+    ELSIF TG_OP = 'DELETE' THEN
+        changed := ARRAY(SELECT patient_id FROM old_rows);
+    ELSE
+        changed := ARRAY(SELECT patient_id FROM (SELECT * FROM old_rows EXCEPT SELECT * FROM new_rows) AS o
+                         UNION
+                         SELECT patient_id FROM (SELECT * FROM new_rows EXCEPT SELECT * FROM old_rows) AS n);
+    END IF;
+    IF cardinality(changed) > 0 THEN
+        SELECT array_agg(appointment_date), array_agg(doctor_name) INTO dates, doctors
+        FROM (SELECT DISTINCT appointment_date, doctor_name FROM appointments WHERE patient_id = ANY(changed)) AS k;
+        IF dates IS NOT NULL THEN
+            PERFORM schedule_versions_bump(dates, doctors);
+        END IF;
+    END IF;
+    RETURN NULL;
+END
+$$
+"""
+
+
+def _create_triggers(table: str, function: str) -> None:
+    # Таблицы переходов можно объявить только у триггера на одно событие
+    op.execute(f"CREATE TRIGGER {table}_schedule_versions_insert AFTER INSERT ON {table} "
+               f"REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION {function}()")
+    op.execute(f"CREATE TRIGGER {table}_schedule_versions_update AFTER UPDATE ON {table} "
+               f"REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION {function}()")
+    op.execute(f"CREATE TRIGGER {table}_schedule_versions_delete AFTER DELETE ON {table} "
+               f"REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION {function}()")
+    op.execute(f"CREATE TRIGGER {table}_schedule_versions_truncate AFTER TRUNCATE ON {table} "
+               f"FOR EACH STATEMENT EXECUTE FUNCTION {function}()")
+
+
+def _drop_triggers(table: str) -> None:
+    for event in ("insert", "update", "delete", "truncate"):
+        op.execute(f"DROP TRIGGER {table}_schedule_versions_{event} ON {table}")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE SEQUENCE schedule_version_seq")
+    op.create_table('schedule_versions',
+    sa.Column('appointment_date', sa.Date(), nullable=False),
+    sa.Column('doctor_name', sa.String(), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('appointment_date', 'doctor_name')
+    )
+    op.execute("""
+        INSERT INTO schedule_versions (appointment_date, doctor_name, version)
+        SELECT appointment_date, doctor_name, nextval('schedule_version_seq')
+        FROM (SELECT DISTINCT appointment_date, doctor_name FROM appointments
+              WHERE appointment_date IS NOT NULL AND doctor_name IS NOT NULL) AS k
+    """)
+    op.execute(BUMP)
+    op.execute(ON_APPOINTMENTS)
+    op.execute(ON_PATIENTS)
+    _create_triggers('appointments', 'schedule_versions_on_appointments')
+    _create_triggers('patients', 'schedule_versions_on_patients')
+
+    # Поиск записей пациента в триггере; CONCURRENTLY не блокирует запись в appointments
+    with op.get_context().autocommit_block():
+        op.create_index('ix_appointments_patient_id', 'appointments', ['patient_id'],
+                        unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_appointments_patient_id', table_name='appointments', postgresql_concurrently=True)
+    _drop_triggers('patients')
+    _drop_triggers('appointments')
+    op.execute("DROP FUNCTION schedule_versions_on_patients()")
+    op.execute("DROP FUNCTION schedule_versions_on_appointments()")
+    op.execute("DROP FUNCTION schedule_versions_bump(date[], varchar[])")
+    op.drop_table('schedule_versions')
+    op.execute("DROP SEQUENCE schedule_version_seq")
@@ -0,0 +1,35 @@
+"""transactions: creation time for pending reservations
+
+Revision ID: c8f2d6a4e913
+Revises: b5e1c9d4f372
+Create Date: 2025-05-20 10:35:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8f2d6a4e913'
+down_revision: Union[str, None] = 'b5e1c9d4f372'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Ограничение снимается в 5b8e0d4c7a12; здесь - для баз, обновленных до 5b8e0d4c7a12 раньше, чем это появилось
+    op.execute("ALTER TABLE transactions DROP CONSTRAINT IF EXISTS transactions_user_id_key")
+    # now() стабильна в пределах оператора, поэтому столбец добавляется без перезаписи таблицы
+    op.add_column('transactions', sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False))
+    op.create_index('ix_transactions_pending_created_at', 'transactions', ['created_at'], unique=False,
+                    postgresql_where=sa.text("status = 'pending'"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_transactions_pending_created_at', table_name='transactions',
+                  postgresql_where=sa.text("status = 'pending'"))
+    op.drop_column('transactions', 'created_at')
@@ -0,0 +1,35 @@
+"""bigint patient_id
+
+Revision ID: d41e7b2f9a63
+Revises: 9c2f6a1e3d58
+Create Date: 2025-05-20 10:15:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41e7b2f9a63'
+down_revision: Union[str, None] = '9c2f6a1e3d58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Идентификаторы пациентов из внешней системы (29872499824296) не помещаются в int4
+    op.alter_column('patients', 'patient_id', existing_type=sa.Integer(), type_=sa.BigInteger(),
+                    existing_nullable=False)
+    op.alter_column('appointments', 'patient_id', existing_type=sa.Integer(), type_=sa.BigInteger(),
+                    existing_nullable=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.alter_column('appointments', 'patient_id', existing_type=sa.BigInteger(), type_=sa.Integer(),
+                    existing_nullable=True)
+    op.alter_column('patients', 'patient_id', existing_type=sa.BigInteger(), type_=sa.Integer(),
+                    existing_nullable=False)
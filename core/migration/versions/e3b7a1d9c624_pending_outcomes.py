@@ -0,0 +1,31 @@
+"""pending outcomes of patients not yet imported
+
+Revision ID: e3b7a1d9c624
+Revises: c8f2d6a4e913
+Create Date: 2025-05-20 10:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3b7a1d9c624'
+down_revision: Union[str, None] = 'c8f2d6a4e913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('pending_outcomes',
+    sa.Column('outcome_id', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('outcome_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('pending_outcomes')
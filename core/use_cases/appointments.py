@@ -0,0 +1,45 @@
+import datetime
+from sqlalchemy import select
+from config.database import async_session_maker
+from core.entities import Appointment
+from core.use_cases.serialization import rows_to_dicts, ndjson_lines
+
+# Сколько строк забирать из курсора за раз при потоковой выдаче
+STREAM_CHUNK_SIZE = 1000
+
+
+def appointments_query(date_from: datetime.date,
+                       date_to: datetime.date | None = None,
+                       doctor_names: list[str] | None = None,
+                       after_id: int | None = None,
+                       limit: int | None = None):
+    """
+    Записи за день или диапазон дней, при необходимости по списку врачей.
+    Порядок по appointment_id: страница продолжается с after_id (keyset),
+    без OFFSET, поэтому дальние страницы не дороже первых.
+    """
+    appointment = Appointment.Appointment
+    query = (
+        select(*[getattr(appointment, col) for col in Appointment.AppointmentInDB.model_fields])
+        .filter(appointment.appointment_date.between(date_from, date_to or date_from))
+        .order_by(appointment.appointment_id)
+    )
+    if doctor_names:
+        query = query.filter(appointment.doctor_name.in_(doctor_names))
+    if after_id is not None:
+        query = query.filter(appointment.appointment_id > after_id)
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
+async def stream_appointments_ndjson(query):
+    """
+    Построчная выдача записей в формате NDJSON через серверный курсор.
+    Сессия открывается внутри генератора: тело ответа отправляется уже после
+    того, как зависимости запроса завершены.
+    """
+    async with async_session_maker() as session:
+        result = await session.stream(query.execution_options(yield_per=STREAM_CHUNK_SIZE))
+        async for rows in result.partitions():
+            yield ndjson_lines(rows_to_dicts(rows, Appointment.AppointmentInDB))
@@ -1,6 +1,13 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from passlib.context import CryptContext
+from fastapi import HTTPException, status
+from config.app_settings import settings as app_settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# min_rounds = default_rounds: хэши с меньшей стоимостью считаются устаревшими (needs_update)
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto",
+                           bcrypt__default_rounds=app_settings.BCRYPT_ROUNDS,
+                           bcrypt__min_rounds=app_settings.BCRYPT_ROUNDS)
 
 def get_password_hash(password: str) -> str:
     # создание хэша пароля
@@ -11,8 +18,58 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
-from jose import jwt
+class PasswordHasher:
+    """
+    Выполняет bcrypt в отдельном ограниченном пуле потоков, чтобы вход и регистрация
+    не блокировали event loop. Если очередь переполнена, запрос отклоняется с 503.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self.pending = 0      # выполняются + ждут в очереди (меняется только из event loop)
+        self.completed = 0
+        self.rejected = 0
+
+    async def _run(self, func, *args):
+        if self.pending >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail='Сервис перегружен, повторите попытку позже')
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    def stats(self) -> dict:
+        return {"workers": self.workers,
+                "in_flight": min(self.pending, self.workers),
+                "queued": max(self.pending - self.workers, 0),
+                "completed": self.completed,
+                "rejected": self.rejected}
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    # Проверка без вычисления bcrypt: только разбор параметров хэша
+    return app_settings.PASSWORD_REHASH_ON_LOGIN and pwd_context.needs_update(hashed_password)
+
+
+password_hasher = PasswordHasher(app_settings.PASSWORD_HASH_WORKERS, app_settings.PASSWORD_HASH_MAX_QUEUE)
+
+
+from jose import jwt, JWTError
 from datetime import datetime, timedelta, timezone
+from fastapi import Request, Depends
+from sqlalchemy import select 
 from config.jwt_settings import get_auth_data
 
 def create_access_token(data: dict) -> str:
@@ -24,11 +81,32 @@ def create_access_token(data: dict) -> str:
     return encode_jwt
 
 
-from fastapi import Request, HTTPException, status, Depends
-from jose import jwt, JWTError
-from sqlalchemy import select 
+from sqlalchemy import update, event
 from config.database import async_session_maker
 from core.entities import User
+from core.use_cases.cache import MemoryBackend
+from core.use_cases.metrics import stage
+
+# Декодированные токены и пользователи: горячий путь авторизации не ходит в БД
+token_cache = MemoryBackend(app_settings.TOKEN_CACHE_SIZE, app_settings.TOKEN_CACHE_TTL)
+user_cache = MemoryBackend(app_settings.USER_CACHE_SIZE, app_settings.USER_CACHE_TTL)
+_user_loads: dict[int, asyncio.Future] = {}
+
+
+@event.listens_for(User.User, "after_update")
+@event.listens_for(User.User, "after_delete")
+def _invalidate_user(mapper, connection, target):
+    user_cache.delete(target.user_id)
+
+async def rehash_password(user_id: int, plain_password: str) -> None:
+    # Фоновое обновление хэша пароля до текущей стоимости bcrypt (после ответа на /login)
+    hashed_password = await password_hasher.hash(plain_password)
+    async with async_session_maker() as session:
+        async with session.begin():
+            await session.execute(
+                update(User.User).where(User.User.user_id == user_id).values(hashed_password=hashed_password)
+            )
+    user_cache.delete(user_id)
 
 def get_token(request: Request):
     token = request.cookies.get('users_access_token')
@@ -36,12 +114,41 @@ def get_token(request: Request):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Token not found')
     return token
 
+def decode_token(token: str) -> dict:
+    payload = token_cache.get(token)
+    if payload is None:
+        try:
+            auth_data = get_auth_data()
+            payload = jwt.decode(token, auth_data['secret_key'], algorithms=[auth_data['algorithm']])
+        except JWTError:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Токен не валидный!')
+        token_cache.set(token, payload)
+    return payload
+
+async def _load_user(user_id: int):
+    async with async_session_maker() as session:
+        result = select(User.User).filter(User.User.user_id == user_id)
+        return (await session.execute(result)).scalars().first()
+
+async def get_user(user_id: int):
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+    # Одновременные запросы одного пользователя ждут одну загрузку из БД
+    load = _user_loads.get(user_id)
+    if load is None:
+        load = asyncio.ensure_future(_load_user(user_id))
+        _user_loads[user_id] = load
+        load.add_done_callback(lambda _: _user_loads.pop(user_id, None))
+    user = await asyncio.shield(load)
+    if user is not None:
+        user_cache.set(user_id, user)
+    return user
+
 async def get_current_user(token: str = Depends(get_token)):
-    try:
-        auth_data = get_auth_data()
-        payload = jwt.decode(token, auth_data['secret_key'], algorithms=[auth_data['algorithm']])
-    except JWTError:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Токен не валидный!')
+    # FastAPI вызывает зависимость один раз за запрос, даже если ее используют get_me и get_balance
+    with stage("auth.token"):
+        payload = decode_token(token)
 
     expire = payload.get('exp')
     expire_time = datetime.fromtimestamp(int(expire), tz=timezone.utc)
@@ -52,9 +159,8 @@ async def get_current_user(token: str = Depends(get_token)):
     if not user_id:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Не найден ID пользователя')
 
-    async with async_session_maker() as session:
-        result = select(User.User).filter(User.User.user_id == int(user_id))
-        user = (await session.execute(result)).scalars().first()
+    with stage("auth.user"):
+        user = await get_user(int(user_id))
     
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='User not found')
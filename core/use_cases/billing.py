@@ -0,0 +1,172 @@
+import asyncio
+import datetime
+import logging
+from sqlalchemy import select, update, func, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from config.database import async_session_maker, try_advisory_lock
+from core.entities import Transaction
+
+logger = logging.getLogger(__name__)
+
+# Статусы транзакций, которые входят в баланс
+BALANCE_STATUSES = ("completed", "pending")
+
+
+def _ledger_sum(user_id):
+    return select(func.coalesce(func.sum(Transaction.Transaction.amount), 0)).where(
+        Transaction.Transaction.user_id == user_id,
+        Transaction.Transaction.status.in_(BALANCE_STATUSES)
+    ).scalar_subquery()
+
+
+async def ensure_wallet(session: AsyncSession, user_id: int) -> None:
+    # Кошелек для пользователя, у которого его еще нет: баланс считается по журналу один раз
+    await session.execute(
+        insert(Transaction.Wallet)
+        .values(user_id=user_id, balance=_ledger_sum(user_id))
+        .on_conflict_do_nothing(index_elements=["user_id"])
+    )
+
+
+async def get_wallet_balance(session: AsyncSession, user_id: int) -> float:
+    query = select(Transaction.Wallet.balance).where(Transaction.Wallet.user_id == user_id)
+    balance = (await session.execute(query)).scalar()
+    if balance is None:
+        await ensure_wallet(session, user_id)
+        balance = (await session.execute(query)).scalar()
+        await session.commit()
+    return float(balance)
+
+
+async def credit(session: AsyncSession, user_id: int, amount: float) -> Transaction.Transaction:
+    # Пополнение: проведенная транзакция и увеличение баланса в одной транзакции БД
+    await ensure_wallet(session, user_id)
+    await session.execute(
+        update(Transaction.Wallet)
+        .where(Transaction.Wallet.user_id == user_id)
+        .values(balance=Transaction.Wallet.balance + amount)
+    )
+    transaction = Transaction.Transaction(user_id=user_id, amount=amount, status="completed")
+    session.add(transaction)
+    await session.flush()
+    return transaction
+
+
+# Резерв одним оператором: условное уменьшение баланса кошелька и транзакция в статусе pending.
+# Строка кошелька заблокирована только на время оператора, параллельные списания не уведут баланс в минус
+RESERVE = text("""
+    WITH wallet AS (
+        UPDATE wallets SET balance = balance - CAST(:amount AS numeric)
+        WHERE user_id = :user_id AND balance >= CAST(:amount AS numeric)
+        RETURNING balance
+    ), charge AS (
+        INSERT INTO transactions (user_id, amount, status)
+        SELECT :user_id, -CAST(:amount AS numeric), 'pending' FROM wallet
+        RETURNING transaction_id
+    )
+    SELECT charge.transaction_id, wallet.balance FROM charge, wallet
+""")
+
+# Итоги группы резервов одним оператором: pending -> completed / failed, по failed
+# суммы возвращаются в кошельки. Меняются только pending, поэтому повторное
+# применение тех же итогов (восстановление из журнала) ничего не меняет
+APPLY_OUTCOMES = text("""
+    WITH outcome AS (
+        UPDATE transactions t SET status = o.status
+        FROM unnest(CAST(:transaction_ids AS integer[]), CAST(:statuses AS varchar[])) AS o(transaction_id, status)
+        WHERE t.transaction_id = o.transaction_id AND t.status = 'pending'
+        RETURNING t.user_id, t.amount, t.status
+    ), refund AS (
+        SELECT user_id, -SUM(amount) AS amount FROM outcome WHERE status = 'failed' GROUP BY user_id
+    )
+    UPDATE wallets w SET balance = w.balance + refund.amount FROM refund WHERE w.user_id = refund.user_id
+""")
+
+
+async def reserve(session: AsyncSession, user_id: int, amount: float) -> tuple[int, float] | None:
+    """
+    Резервирует amount под списание. Возвращает (transaction_id, баланс после
+    резерва) или None, если средств недостаточно. Итог резерва записывается
+    через очередь (core/use_cases/billing_queue.py), поэтому транзакцию БД можно
+    зафиксировать сразу и считать прогноз без нее.
+    """
+    params = {"user_id": user_id, "amount": amount}
+    row = (await session.execute(RESERVE, params)).first()
+    if row is None:
+        # Либо средств не хватает, либо у пользователя еще нет кошелька
+        await ensure_wallet(session, user_id)
+        row = (await session.execute(RESERVE, params)).first()
+        if row is None:
+            return None
+    return row.transaction_id, float(row.balance)
+
+
+async def apply_outcomes(session: AsyncSession, outcomes: dict[int, bool]) -> None:
+    # outcomes: transaction_id -> прогноз выдан (completed) или нет (failed, возврат средств)
+    await session.execute(APPLY_OUTCOMES, {
+        "transaction_ids": list(outcomes),
+        "statuses": ["completed" if succeeded else "failed" for succeeded in outcomes.values()],
+    })
+
+
+async def fail_stale_pending(pending_timeout: int) -> int:
+    """
+    Возврат резервов, которые остаются pending дольше pending_timeout секунд:
+    процесс остановился во время расчета, итог в журнал не попал и ответ
+    клиенту не ушел. Возвращает число возвращенных резервов.
+    """
+    async with async_session_maker() as session:
+        async with session.begin():
+            stale = (await session.execute(
+                select(Transaction.Transaction.transaction_id).where(
+                    Transaction.Transaction.status == "pending",
+                    Transaction.Transaction.created_at < func.now() - datetime.timedelta(seconds=pending_timeout)
+                )
+            )).scalars().all()
+            if stale:
+                await apply_outcomes(session, dict.fromkeys(stale, False))
+    if stale:
+        logger.warning("Сверка балансов: возвращено резервов без итога %d (%s)", len(stale), stale[:20])
+    return len(stale)
+
+
+async def reconcile_balances() -> int:
+    """
+    Сверка кошельков с журналом транзакций. На время сверки кошельки блокируются
+    от изменений, чтобы сумма по журналу и баланс относились к одному моменту.
+    Возвращает число исправленных (или созданных) кошельков.
+    """
+    async with async_session_maker() as session:
+        async with session.begin():
+            await session.execute(text("LOCK TABLE wallets IN SHARE ROW EXCLUSIVE MODE"))
+            result = await session.execute(text("""
+                INSERT INTO wallets (user_id, balance)
+                SELECT u.user_id, COALESCE(SUM(t.amount) FILTER (WHERE t.status IN ('completed', 'pending')), 0)
+                FROM users u LEFT JOIN transactions t ON t.user_id = u.user_id
+                GROUP BY u.user_id
+                ON CONFLICT (user_id) DO UPDATE SET balance = EXCLUDED.balance
+                WHERE wallets.balance <> EXCLUDED.balance
+                RETURNING user_id
+            """))
+            fixed = result.scalars().all()
+    if fixed:
+        logger.warning("Сверка балансов: исправлено кошельков %d (%s)", len(fixed), fixed[:20])
+    return len(fixed)
+
+
+async def reconcile_periodically(interval: int, pending_timeout: int, replay_journals) -> None:
+    # replay_journals - применение брошенных журналов итогов (BillingQueue.replay) до возврата
+    # зависших резервов: иначе выданный прогноз из журнала упавшего воркера вернулся бы как failed
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            # Задача запущена в каждом воркере, сверяет только взявший блокировку
+            async with try_advisory_lock("billing_reconcile") as locked:
+                if not locked:
+                    continue
+                await replay_journals()
+                await fail_stale_pending(pending_timeout)
+                await reconcile_balances()
+        except Exception:
+            logger.exception("Ошибка сверки балансов")
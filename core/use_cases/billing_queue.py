@@ -0,0 +1,198 @@
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import uuid
+from config.app_settings import settings
+from config.database import async_session_maker
+from core.use_cases import billing
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_SUFFIX = ".journal"
+RETRY_DELAY = 0.5       # Первая пауза перед повтором записи в БД, секунд (дальше удваивается)
+MAX_RETRY_DELAY = 30
+SHUTDOWN_TIMEOUT = 10   # Сколько ждать запись накопленных итогов при остановке, секунд
+
+
+class BillingQueue:
+    """
+    Итоги резервов (прогноз выдан - completed, нет - failed с возвратом средств)
+    с групповой записью. Итог сначала дописывается в журнал процесса на диске:
+    одна запись с fsync на всю накопленную группу, после нее finalize возвращает
+    управление. Затем группа применяется в БД одним оператором, и журнал очищается.
+    Журнал процесса, остановившегося до записи в БД, применяет следующий
+    запущенный процесс (файл журнала заблокирован flock, пока жив владелец).
+    """
+
+    def __init__(self, journal_dir: str, max_batch: int):
+        self.journal_dir = journal_dir
+        self.max_batch = max_batch
+        self._pending: list = []            # [(transaction_id, итог, future)]
+        self._wakeup: asyncio.Event | None = None
+        self._closing = False
+        self._task: asyncio.Task | None = None
+        self._journal = None
+        self._journal_path = None
+        self.batches = 0
+        self.outcomes = 0
+        self.errors = 0
+        self.replayed = 0
+
+    async def start(self) -> None:
+        os.makedirs(self.journal_dir, exist_ok=True)
+        await self.replay()
+
+        # Файл блокируется до появления под именем журнала: процесс, который в это
+        # время ищет брошенные журналы, не примет его за брошенный
+        path = os.path.join(self.journal_dir, f"billing-{uuid.uuid4().hex}")
+        self._journal = open(path + ".new", "ab")
+        fcntl.flock(self._journal, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        os.rename(path + ".new", path + JOURNAL_SUFFIX)
+        self._journal_path = path + JOURNAL_SUFFIX
+
+        self._closing = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def shutdown(self) -> None:
+        # Накопленные итоги дописываются; журнал удаляется, только если все из него применено в БД
+        if self._task is None:
+            return
+        self._closing = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(self._task, SHUTDOWN_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning("Итоги списаний не записаны в БД до остановки, останутся в журнале %s", self._journal_path)
+        self._task = None
+        if os.fstat(self._journal.fileno()).st_size == 0:
+            os.remove(self._journal_path)
+        self._journal.close()
+        self._journal = None
+
+    async def finalize(self, transaction_id: int, succeeded: bool) -> None:
+        """Итог резерва; возвращает управление, когда итог записан в журнал."""
+        if self._task is None:
+            # Очередь не запущена (скрипты без lifespan приложения) - сразу в БД
+            await self._apply({transaction_id: succeeded})
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((transaction_id, succeeded, future))
+        self._wakeup.set()
+        await future
+
+    async def replay(self, strict: bool = False) -> int:
+        """
+        Применяет журналы остановившихся процессов: блокировку можно взять, только
+        если владельца нет. strict - ошибка, если какой-то журнал не применен
+        (сверка тогда не возвращает средства по резервам, итоги которых в нем).
+        """
+        replayed = failed = 0
+        for name in sorted(os.listdir(self.journal_dir)):
+            if not name.endswith(JOURNAL_SUFFIX):
+                continue
+            path = os.path.join(self.journal_dir, name)
+            with open(path, "rb") as f:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                outcomes = _read_journal(f)
+                try:
+                    if outcomes:
+                        await self._apply(outcomes, retry=False)
+                except Exception:
+                    # Журнал остается на месте: его применит следующий запуск
+                    logger.exception("Не удалось применить журнал списаний %s", path)
+                    failed += 1
+                    continue
+                os.remove(path)
+            replayed += len(outcomes)
+            if outcomes:
+                logger.warning("Применен журнал списаний %s: итогов %d", path, len(outcomes))
+        self.replayed += replayed
+        if strict and failed:
+            raise RuntimeError(f"Не применено журналов списаний: {failed}")
+        return replayed
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            # Пока группа пишется, новые итоги копятся и уходят следующей группой
+            while self._pending:
+                batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+                await self._flush(batch)
+            if self._closing:
+                return
+
+    async def _flush(self, batch: list) -> None:
+        outcomes = {transaction_id: succeeded for transaction_id, succeeded, _ in batch}
+        try:
+            await asyncio.to_thread(self._write_journal, outcomes)
+        except Exception as e:
+            logger.exception("Ошибка записи журнала списаний")
+            for *_, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for *_, future in batch:
+            if not future.done():
+                future.set_result(None)
+
+        await self._apply(outcomes)
+        # Группы пишутся по одной, поэтому все, что есть в журнале, уже в БД
+        await asyncio.to_thread(self._journal.truncate, 0)
+
+    def _write_journal(self, outcomes: dict[int, bool]) -> None:
+        lines = "".join(json.dumps({"transaction_id": transaction_id, "succeeded": succeeded}) + "\n"
+                        for transaction_id, succeeded in outcomes.items())
+        self._journal.write(lines.encode())
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+
+    async def _apply(self, outcomes: dict[int, bool], retry: bool = True) -> None:
+        # Итог уже в журнале: при недоступной БД запись повторяется, а не теряется
+        delay = RETRY_DELAY
+        while True:
+            try:
+                async with async_session_maker() as session:
+                    async with session.begin():
+                        await billing.apply_outcomes(session, outcomes)
+                break
+            except Exception:
+                self.errors += 1
+                if not retry:
+                    raise
+                logger.exception("Ошибка записи итогов списаний в БД, повтор через %s с", delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_RETRY_DELAY)
+        self.batches += 1
+        self.outcomes += len(outcomes)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "outcomes": self.outcomes,
+            "outcomes_per_batch": self.outcomes / self.batches if self.batches else 0.0,
+            "pending": len(self._pending),
+            "errors": self.errors,
+            "replayed": self.replayed,
+        }
+
+
+def _read_journal(f) -> dict[int, bool]:
+    outcomes = {}
+    for line in f:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            # Оборванная последняя строка: запись не завершилась, finalize не вернул управление
+            continue
+        outcomes[entry["transaction_id"]] = entry["succeeded"]
+    return outcomes
+
+
+billing_queue = BillingQueue(settings.BILLING_JOURNAL_DIR, settings.BILLING_MAX_BATCH)
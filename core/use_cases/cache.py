@@ -0,0 +1,99 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheBackend:
+    """
+    Интерфейс хранилища кэша. Значения можно помечать тегом (например, id пациента),
+    чтобы затем разом удалить все значения с этим тегом.
+    """
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, tag=None) -> None:
+        raise NotImplementedError
+
+    def delete(self, key) -> None:
+        raise NotImplementedError
+
+    def invalidate_tag(self, tag) -> int:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        raise NotImplementedError
+
+
+class MemoryBackend(CacheBackend):
+    """In-memory LRU кэш с ограничением размера и временем жизни записей."""
+
+    def __init__(self, maxsize: int, ttl: float | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()   # key -> (expires_at, value, tag)
+        self._tags: dict = {}                     # tag -> set(key)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _remove(self, key) -> None:
+        _, _, tag = self._data.pop(key)
+        if tag is not None:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            if item[0] is not None and item[0] < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key, value, tag=None) -> None:
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (expires_at, value, tag)
+            if tag is not None:
+                self._tags.setdefault(tag, set()).add(key)
+            # Вытесняем самые давно использованные записи
+            while len(self._data) > self.maxsize:
+                self._remove(next(iter(self._data)))
+                self.evictions += 1
+
+    def delete(self, key) -> None:
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+    def invalidate_tag(self, tag) -> int:
+        with self._lock:
+            keys = list(self._tags.get(tag, ()))
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._tags.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._data), "maxsize": self.maxsize,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
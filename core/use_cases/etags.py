@@ -0,0 +1,35 @@
+import datetime
+import hashlib
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.entities import ScheduleVersion
+
+
+async def schedule_etag(session: AsyncSession, date_from: datetime.date, date_to: datetime.date,
+                        doctor_names: list[str] | None, *parts) -> str:
+    """
+    Слабый ETag ответа по расписанию: версии всех (день, врач) периода и parts
+    (параметры ответа, например версия модели). Версии поднимают триггеры БД,
+    поэтому любое изменение записей или пациентов этих дней меняет ETag.
+    """
+    version = ScheduleVersion.ScheduleVersion
+    query = (
+        select(version.appointment_date, version.doctor_name, version.version)
+        .where(version.appointment_date.between(date_from, date_to))
+        .order_by(version.appointment_date, version.doctor_name)
+    )
+    if doctor_names:
+        query = query.where(version.doctor_name.in_(doctor_names))
+    rows = (await session.execute(query)).all()
+    digest = hashlib.blake2b(repr((parts, [tuple(row) for row in rows])).encode(), digest_size=16)
+    return f'W/"{digest.hexdigest()}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    # Слабое сравнение, как требует If-None-Match: префикс W/ не учитывается
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tag = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == tag for candidate in if_none_match.split(","))
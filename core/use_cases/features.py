@@ -0,0 +1,130 @@
+"""
+Инкрементальный пересчет признаков истории пациента (no_show_cumsum,
+appointment_cumcount, no_show_ratio) по новым исходам приемов.
+
+Обрабатываются только исходы после сохраненной позиции (watermark), поэтому
+ежедневное обновление стоит O(новых строк). Счетчики пациентов и позиция
+меняются в одной транзакции: повторный или прерванный запуск ничего не
+учитывает дважды. Исходы пациентов, которых еще нет в patients, ждут их
+в pending_outcomes и не задерживают остальные. Исходы загружает
+core/use_cases/ingest.py (--outcomes), пересчет:
+    python -m core.use_cases.features
+"""
+import asyncio
+import logging
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from config.database import async_session_maker, try_advisory_lock
+from core.entities import Outcome
+
+logger = logging.getLogger(__name__)
+
+WATERMARK = "patient_features"
+BATCH_SIZE = 100000
+
+
+async def apply_outcomes(batch_size: int = BATCH_SIZE) -> tuple[int, int]:
+    """
+    Учитывает в признаках пациентов следующую порцию исходов (не больше batch_size).
+    Исходы пациентов, которых еще нет в patients, откладываются в pending_outcomes
+    и учитываются первым пересчетом после появления пациента; позиция идет дальше.
+    Возвращает (число разобранных исходов - новых и отложенных ранее, число
+    обновленных пациентов); (0, 0) - разбирать нечего.
+    """
+    async with async_session_maker() as session:
+        async with session.begin():
+            # Ждем завершения транзакций, которые вставляют исходы: иначе исход с меньшим
+            # outcome_id мог бы закоммититься после того, как позиция ушла дальше
+            await session.execute(text("LOCK TABLE outcomes IN SHARE MODE"))
+            await session.execute(
+                insert(Outcome.Watermark).values(name=WATERMARK, last_id=0)
+                .on_conflict_do_nothing(index_elements=["name"])
+            )
+            low = (await session.execute(
+                text("SELECT last_id FROM watermarks WHERE name = :name FOR UPDATE"), {"name": WATERMARK}
+            )).scalar()
+            high = (await session.execute(
+                text("""SELECT max(outcome_id) FROM (
+                            SELECT outcome_id FROM outcomes WHERE outcome_id > :low
+                            ORDER BY outcome_id LIMIT :limit) AS batch"""),
+                {"low": low, "limit": batch_size}
+            )).scalar()
+            if high is None:
+                # Новых исходов нет - разбираются только отложенные
+                high = low
+
+            # Приращения счетчиков по пациентам: исходы за (low, high] с известным пациентом
+            # и отложенные исходы, чей пациент появился. Доля пропусков считается как
+            # в исходном ноутбуке: cumsum / cumcount * 100
+            result = await session.execute(text("""
+                WITH batch AS (
+                    SELECT outcome_id, patient_id, no_show,
+                           EXISTS (SELECT 1 FROM patients p WHERE p.patient_id = o.patient_id) AS known
+                    FROM outcomes o WHERE outcome_id > :low AND outcome_id <= :high
+                ), deferred AS (
+                    INSERT INTO pending_outcomes (outcome_id)
+                    SELECT outcome_id FROM batch WHERE NOT known
+                    RETURNING outcome_id
+                ), resolved AS (
+                    DELETE FROM pending_outcomes w USING outcomes o
+                    WHERE o.outcome_id = w.outcome_id
+                      AND EXISTS (SELECT 1 FROM patients p WHERE p.patient_id = o.patient_id)
+                    RETURNING o.patient_id, o.no_show
+                ), applied AS (
+                    SELECT patient_id, no_show FROM batch WHERE known
+                    UNION ALL
+                    SELECT patient_id, no_show FROM resolved
+                ), delta AS (
+                    SELECT patient_id, count(*) AS appointments, count(*) FILTER (WHERE no_show) AS no_shows
+                    FROM applied
+                    GROUP BY patient_id
+                ), updated AS (
+                    UPDATE patients p SET
+                        no_show_cumsum = p.no_show_cumsum + d.no_shows,
+                        appointment_cumcount = p.appointment_cumcount + d.appointments,
+                        no_show_ratio = (p.no_show_cumsum + d.no_shows) * 100.0 / (p.appointment_cumcount + d.appointments)
+                    FROM delta d WHERE p.patient_id = d.patient_id
+                    RETURNING p.patient_id
+                )
+                SELECT (SELECT count(*) FROM batch) + (SELECT count(*) FROM resolved),
+                       (SELECT count(*) FROM updated), (SELECT count(*) FROM deferred)
+            """), {"low": low, "high": high})
+            outcomes, patients, deferred = map(int, result.one())
+
+            if high > low:
+                await session.execute(
+                    text("UPDATE watermarks SET last_id = :high WHERE name = :name"), {"high": high, "name": WATERMARK}
+                )
+    if deferred:
+        logger.warning("Признаки пациентов: отложено исходов пациентов, которых нет в patients: %d", deferred)
+    return outcomes, patients
+
+
+async def refresh_patient_features(batch_size: int = BATCH_SIZE) -> int:
+    # Все накопившиеся исходы порциями; каждая порция - отдельная транзакция
+    total = 0
+    while True:
+        outcomes, patients = await apply_outcomes(batch_size)
+        if not outcomes:
+            break
+        total += outcomes
+        logger.info("Признаки пациентов: разобрано исходов %d, обновлено пациентов %d", outcomes, patients)
+    return total
+
+
+async def refresh_periodically(interval: int) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            # Задача запущена в каждом воркере, пересчитывает только взявший блокировку
+            async with try_advisory_lock("patient_features") as locked:
+                if not locked:
+                    continue
+                await refresh_patient_features()
+        except Exception:
+            logger.exception("Ошибка пересчета признаков пациентов")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    print({"outcomes": asyncio.run(refresh_patient_features())})
@@ -0,0 +1,193 @@
+"""
+Загрузка выгрузок Patients.csv и Appointments.csv в Postgres.
+
+Файлы читаются порциями, каждая порция проверяется по схемам PatientInDB /
+AppointmentInDB, заливается через COPY во временную staging таблицу и оттуда
+одним INSERT ... ON CONFLICT переносится в рабочую таблицу:
+    python -m core.use_cases.ingest --patients data/Patients.csv --appointments data/Appointments.csv
+"""
+import argparse
+import asyncio
+import csv
+import logging
+import time
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+import asyncpg
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from config.db_settings import get_db_url
+from core.entities import Appointment, Outcome, Patient
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 50000
+
+
+class Feed:
+    """Описание одной выгрузки: схема строки, целевая таблица, ключ и обновляемые колонки для upsert."""
+
+    def __init__(self, schema: type[BaseModel], table: str, key: str, updates: list[str] | None = None):
+        self.schema = schema
+        self.table = table
+        self.key = key
+        self.columns = list(schema.model_fields)
+        # Колонки, которые перезаписывает повторная загрузка строки: None - все, кроме ключа;
+        # [] - уже загруженные строки не меняются
+        self.updates = [col for col in self.columns if col != key] if updates is None else updates
+        self.adapter = TypeAdapter(list[schema])
+
+    @property
+    def staging(self) -> str:
+        return f"staging_{self.table}"
+
+    def upsert_sql(self) -> str:
+        # Внутри порции остается последняя строка по ключу (как drop_duplicates(keep='last'))
+        columns = ", ".join(self.columns)
+        updates = ", ".join(f"{col} = excluded.{col}" for col in self.updates)
+        conflict = f"DO UPDATE SET {updates}" if self.updates else "DO NOTHING"
+        return f"""
+            INSERT INTO {self.table} ({columns})
+            SELECT DISTINCT ON ({self.key}) {columns} FROM {self.staging}
+            ORDER BY {self.key}, line DESC
+            ON CONFLICT ({self.key}) {conflict}
+        """
+
+
+# Счетчики истории пациента дальше ведет core/use_cases/features.py по исходам приемов:
+# из выгрузки они берутся только для новых пациентов, иначе учтенные исходы потерялись бы
+PATIENT_HISTORY_COLUMNS = ["no_show_cumsum", "appointment_cumcount", "no_show_ratio"]
+
+FEEDS = {
+    "patients": Feed(Patient.PatientInDB, "patients", "patient_id",
+                     updates=[col for col in Patient.PatientInDB.model_fields
+                              if col != "patient_id" and col not in PATIENT_HISTORY_COLUMNS]),
+    "appointments": Feed(Appointment.AppointmentInDB, "appointments", "appointment_id"),
+    # Исходы только добавляются: учтенный в признаках исход менять нельзя
+    "outcomes": Feed(Outcome.OutcomeIn, "outcomes", "appointment_id", updates=[]),
+}
+
+
+def normalize_id(value: str) -> int:
+    # Идентификаторы приходят как float ("29872499824296.0"); через float теряется точность
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f"некорректный идентификатор: {value!r}")
+    if number != number.to_integral_value():
+        raise ValueError(f"идентификатор не целый: {value!r}")
+    return int(number)
+
+
+def read_chunks(path: str, chunk_size: int):
+    # Файл читается построчно, в памяти одновременно не больше двух порций
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        while chunk := list(islice(reader, chunk_size)):
+            yield chunk
+
+
+def validate_chunk(feed: Feed, chunk: list[dict], first_line: int) -> tuple[list[tuple], int]:
+    """
+    Проверяет порцию по схеме и возвращает записи для COPY (колонки feed.columns
+    плюс номер строки файла) и число отброшенных строк.
+    """
+    prepared, rejected = [], 0
+    for i, row in enumerate(chunk):
+        try:
+            row["patient_id"] = normalize_id(row["patient_id"])
+            prepared.append((first_line + i, row))
+        except (KeyError, ValueError) as e:
+            rejected += 1
+            logger.warning("%s: строка %d отброшена: %s", feed.table, first_line + i, e)
+
+    try:
+        # Быстрый путь: вся порция проверяется одним вызовом
+        models = feed.adapter.validate_python([row for _, row in prepared])
+        lines = [line for line, _ in prepared]
+    except ValidationError:
+        models, lines = [], []
+        for line, row in prepared:
+            try:
+                models.append(feed.schema.model_validate(row))
+                lines.append(line)
+            except ValidationError as e:
+                rejected += 1
+                logger.warning("%s: строка %d отброшена: %s", feed.table, line, e.errors()[0]["msg"])
+
+    records = [(*model.__dict__.values(), line) for model, line in zip(models, lines)]
+    return records, rejected
+
+
+async def load_feed(conn: asyncpg.Connection, feed: Feed, path: str, chunk_size: int = CHUNK_SIZE) -> dict:
+    await conn.execute(f"""
+        CREATE TEMP TABLE IF NOT EXISTS {feed.staging}
+        (LIKE {feed.table} INCLUDING DEFAULTS, line bigint NOT NULL)
+    """)
+
+    chunks = read_chunks(path, chunk_size)
+    line = 2  # первая строка данных после заголовка
+
+    def next_batch():
+        nonlocal line
+        chunk = next(chunks, None)
+        if chunk is None:
+            return None
+        batch = validate_chunk(feed, chunk, line)
+        line += len(chunk)
+        return batch
+
+    start = time.perf_counter()
+    loaded = rejected = 0
+    # Следующая порция читается и проверяется в потоке, пока база загружает текущую
+    pending = asyncio.create_task(asyncio.to_thread(next_batch))
+    while (batch := await pending) is not None:
+        pending = asyncio.create_task(asyncio.to_thread(next_batch))
+        records, chunk_rejected = batch
+        rejected += chunk_rejected
+
+        # Каждая порция - отдельная транзакция, чтобы не держать блокировки на весь файл
+        async with conn.transaction():
+            await conn.execute(f"TRUNCATE {feed.staging}")
+            await conn.copy_records_to_table(feed.staging, records=records, columns=[*feed.columns, "line"])
+            await conn.execute(feed.upsert_sql())
+
+        loaded += len(records)
+        elapsed = time.perf_counter() - start
+        logger.info("%s: загружено %d, отброшено %d, %.0f строк/с",
+                    feed.table, loaded, rejected, loaded / elapsed if elapsed else 0)
+
+    elapsed = time.perf_counter() - start
+    return {"table": feed.table, "loaded": loaded, "rejected": rejected,
+            "seconds": round(elapsed, 3), "rows_per_sec": round(loaded / elapsed) if elapsed else 0}
+
+
+async def ingest(patients: str | None, appointments: str | None, outcomes: str | None = None,
+                 chunk_size: int = CHUNK_SIZE) -> list[dict]:
+    conn = await asyncpg.connect(get_db_url().replace("postgresql+asyncpg://", "postgresql://"))
+    try:
+        reports = []
+        # Пациенты раньше записей: записи ссылаются на них по patient_id
+        if patients:
+            reports.append(await load_feed(conn, FEEDS["patients"], patients, chunk_size))
+        if appointments:
+            reports.append(await load_feed(conn, FEEDS["appointments"], appointments, chunk_size))
+        if outcomes:
+            reports.append(await load_feed(conn, FEEDS["outcomes"], outcomes, chunk_size))
+        return reports
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Загрузка Patients.csv и Appointments.csv в базу")
+    parser.add_argument("--patients", help="Путь к Patients.csv")
+    parser.add_argument("--appointments", help="Путь к Appointments.csv")
+    parser.add_argument("--outcomes", help="Путь к файлу исходов приемов (appointment_id, patient_id, appointment_date, no_show)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Строк в одной порции")
+    args = parser.parse_args()
+    if not args.patients and not args.appointments and not args.outcomes:
+        parser.error("нужен хотя бы один из --patients, --appointments, --outcomes")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    for report in asyncio.run(ingest(args.patients, args.appointments, args.outcomes, args.chunk_size)):
+        print(report)
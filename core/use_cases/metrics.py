@@ -0,0 +1,97 @@
+"""
+Метрики Prometheus: длительность запросов по маршрутам (MetricsMiddleware),
+длительность этапов обработки (stage) и показатели пулов и кэшей, которые
+снимаются из их stats() в момент чтения /metrics.
+"""
+import contextvars
+import logging
+import time
+from contextlib import contextmanager
+from prometheus_client import Histogram, REGISTRY
+from prometheus_client.core import GaugeMetricFamily
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+REQUEST_SECONDS = Histogram("http_request_duration_seconds", "Длительность обработки запроса",
+                            ["method", "route", "status"], buckets=BUCKETS)
+STAGE_SECONDS = Histogram("request_stage_duration_seconds", "Длительность этапа обработки запроса",
+                          ["stage"], buckets=BUCKETS)
+
+# Этапы текущего запроса [(этап, секунды)] для лога медленных запросов
+_stages: contextvars.ContextVar[list | None] = contextvars.ContextVar("request_stages", default=None)
+
+
+def observe_stage(name: str, seconds: float) -> None:
+    STAGE_SECONDS.labels(name).observe(seconds)
+    stages = _stages.get()
+    if stages is not None:
+        stages.append((name, seconds))
+
+
+@contextmanager
+def stage(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - start)
+
+
+class StatsCollector:
+    """Числовые поля stats() компонентов как gauge <источник>_<поле>."""
+
+    def __init__(self, sources: dict):
+        self.sources = sources  # имя -> функция, возвращающая dict
+
+    def collect(self):
+        for source, stats in self.sources.items():
+            for key, value in stats().items():
+                if isinstance(value, (int, float)):
+                    yield GaugeMetricFamily(f"{source}_{key}", f"{source}: {key}", value=value)
+
+
+def register_stats(sources: dict) -> None:
+    REGISTRY.register(StatsCollector(sources))
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware: время запроса до отправки последнего байта ответа (включая
+    потоковые ответы) по шаблону маршрута. Если запрос дольше slow_request_ms,
+    в лог пишется разбивка по этапам.
+    """
+
+    def __init__(self, app, slow_request_ms: float = 0):
+        self.app = app
+        self.slow_request_ms = slow_request_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        stages = []
+        token = _stages.set(stages)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            seconds = time.perf_counter() - start
+            _stages.reset(token)
+            # Шаблон маршрута, а не путь: у /predict/{day}/... не должно быть метки на каждую дату
+            route = scope.get("route")
+            REQUEST_SECONDS.labels(scope["method"], route.path if route is not None else "unmatched",
+                                   status_code).observe(seconds)
+            if self.slow_request_ms and seconds * 1000 >= self.slow_request_ms:
+                logger.warning("Медленный запрос %s %s -> %d: %.1f мс; этапы: %s", scope["method"], scope["path"],
+                               status_code, seconds * 1000,
+                               ", ".join(f"{name} {value * 1000:.1f} мс" for name, value in stages) or "нет")
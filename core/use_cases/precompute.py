@@ -0,0 +1,114 @@
+"""
+Ночной расчет прогнозов на ближайшие дни: все записи с сегодняшнего дня по
+сегодня + horizon_days оцениваются каждой моделью из models_dict, результат
+сохраняется в таблицу predictions с версией модели и отпечатком признаков.
+get_predict отдает их, пока признаки и модель не изменились:
+    python -m core.use_cases.precompute --days 1
+"""
+import argparse
+import asyncio
+import datetime
+import logging
+from sqlalchemy import delete, or_
+from sqlalchemy.dialects.postgresql import insert
+from config.app_settings import settings
+from config.database import async_session_maker, try_advisory_lock
+from core.entities import Appointment, Prediction
+from core.use_cases.predict import _feature_rows_select, row_fingerprint, inference, FEATURE_ROW_COLUMNS
+from models.models import rows_to_columns
+from models.registry import registry, models_dict
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 5000
+
+
+def _upsert(values: list[dict]):
+    # Неизменившиеся прогнозы не перезаписываются
+    prediction = Prediction.Prediction
+    query = insert(prediction).values(values)
+    return query.on_conflict_do_update(
+        index_elements=["appointment_id", "model"],
+        set_={col: query.excluded[col]
+              for col in ("model_version", "fingerprint", "probability_visit", "predict_visit", "computed_at")},
+        where=or_(prediction.fingerprint != query.excluded.fingerprint,
+                  prediction.model_version != query.excluded.model_version)
+    )
+
+
+async def precompute_model(model: str, date_from: datetime.date, date_to: datetime.date,
+                           chunk_size: int = CHUNK_SIZE) -> int:
+    version = registry.get(model).version
+    appointment_idx = FEATURE_ROW_COLUMNS.index("appointment_id")
+    query = _feature_rows_select().filter(
+        Appointment.Appointment.appointment_date.between(date_from, date_to)
+    ).execution_options(yield_per=chunk_size)
+
+    total = 0
+    async with async_session_maker() as read_session, async_session_maker() as write_session:
+        result = await read_session.stream(query)
+        async for rows in result.partitions():
+            records = await inference.predict(rows_to_columns(rows, FEATURE_ROW_COLUMNS), model)
+            now = datetime.datetime.now()
+            await write_session.execute(_upsert([
+                {"appointment_id": row[appointment_idx], "model": model, "model_version": version,
+                 "fingerprint": row_fingerprint(row), "probability_visit": record["probability_visit"],
+                 "predict_visit": record["predict_visit"], "computed_at": now}
+                for row, record in zip(rows, records)
+            ]))
+            # Каждая порция фиксируется сразу: прерванный расчет не теряет сделанное
+            await write_session.commit()
+            total += len(rows)
+    return total
+
+
+async def precompute_predictions(horizon_days: int = settings.PREDICTION_HORIZON_DAYS,
+                                 chunk_size: int = CHUNK_SIZE) -> dict[str, int]:
+    date_from = datetime.date.today()
+    date_to = date_from + datetime.timedelta(days=horizon_days)
+
+    # Прогнозы на прошедшие дни больше не запрашиваются
+    async with async_session_maker() as session:
+        appointment = Appointment.Appointment
+        await session.execute(
+            delete(Prediction.Prediction)
+            .where(Prediction.Prediction.appointment_id == appointment.appointment_id,
+                   appointment.appointment_date < date_from)
+        )
+        await session.commit()
+
+    counts = {}
+    for model in models_dict.values():
+        counts[model] = await precompute_model(model, date_from, date_to, chunk_size)
+        logger.info("Прогнозы %s на %s - %s: %d записей", model, date_from, date_to, counts[model])
+    return counts
+
+
+async def precompute_nightly(hour: int, horizon_days: int) -> None:
+    # Запуск каждый день в hour:00 по локальному времени сервера
+    while True:
+        now = datetime.datetime.now()
+        run_at = now.replace(hour=hour, minute=0, second=0, microsecond=0)
+        if run_at <= now:
+            run_at += datetime.timedelta(days=1)
+        await asyncio.sleep((run_at - now).total_seconds())
+        try:
+            # Задача запущена в каждом воркере, считает только взявший блокировку
+            async with try_advisory_lock("precompute_nightly") as locked:
+                if not locked:
+                    logger.info("Ночной расчет прогнозов выполняет другой процесс")
+                    continue
+                await precompute_predictions(horizon_days)
+        except Exception:
+            logger.exception("Ошибка ночного расчета прогнозов")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Расчет прогнозов на ближайшие дни")
+    parser.add_argument("--days", type=int, default=settings.PREDICTION_HORIZON_DAYS,
+                        help="Горизонт в днях после сегодняшнего")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Записей в одной порции")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    print(asyncio.run(precompute_predictions(args.days, args.chunk_size)))
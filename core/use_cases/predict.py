@@ -0,0 +1,256 @@
+import asyncio
+import datetime
+import hashlib
+from collections import defaultdict
+from sqlalchemy import select, and_, or_, event
+from sqlalchemy.orm import Session
+from config.database import async_session_maker
+from core.entities import Appointment, Patient, Prediction
+from core.use_cases.billing_queue import billing_queue
+from core.use_cases.cache import CacheBackend, MemoryBackend
+from core.use_cases.metrics import stage, observe_stage
+from core.use_cases.serialization import ndjson_lines
+from config.app_settings import settings
+from models.inference import Inference
+from models.models import rows_to_columns
+from models.registry import registry
+
+# Колонки строки признаков в том порядке, в котором их возвращает feature_rows_query
+APPOINTMENT_COLUMNS = ["doctor_name", "slot_id", "patient_id", "appointment_id", "appointment_date", "scheduled_date"]
+PATIENT_COLUMNS = ["gender", "age", "neighbourhood", "scholarship", "hipertension", "diabetes", "alcoholism",
+                   "handcap", "sms_received", "no_show_cumsum", "appointment_cumcount", "no_show_ratio"]
+FEATURE_ROW_COLUMNS = APPOINTMENT_COLUMNS + PATIENT_COLUMNS
+# Колонки заранее рассчитанного прогноза, которые stored_feature_rows_query добавляет к строке признаков
+STORED_COLUMNS = ["fingerprint", "model_version", "probability_visit", "predict_visit"]
+
+
+def _feature_rows_select():
+    appointment, patient = Appointment.Appointment, Patient.Patient
+    return (
+        select(*[getattr(appointment, col) for col in APPOINTMENT_COLUMNS],
+               *[getattr(patient, col) for col in PATIENT_COLUMNS])
+        .join(patient, patient.patient_id == appointment.patient_id)
+    )
+
+
+def feature_rows_query(target_date: datetime.date, doctor_name: str):
+    """
+    Один запрос с JOIN записей на пациентов: возвращает плоские кортежи
+    колонок FEATURE_ROW_COLUMNS, готовые для подачи в модель.
+    """
+    appointment = Appointment.Appointment
+    return _feature_rows_select().filter(
+        appointment.appointment_date == target_date,
+        appointment.doctor_name == doctor_name
+    )
+
+
+def stored_feature_rows_query(target_date: datetime.date, doctor_name: str, model: str):
+    # Строки признаков вместе с ночным прогнозом модели (если он есть) - тем же одним запросом
+    prediction = Prediction.Prediction
+    return (
+        feature_rows_query(target_date, doctor_name)
+        .add_columns(*[getattr(prediction, col) for col in STORED_COLUMNS])
+        .outerjoin(prediction, and_(prediction.appointment_id == Appointment.Appointment.appointment_id,
+                                    prediction.model == model))
+    )
+
+
+def _batch_filter(items):
+    # Запись попадает хотя бы в один элемент пакетного запроса
+    appointment = Appointment.Appointment
+    return or_(*[
+        and_(appointment.appointment_date.between(item.date_from, item.date_to or item.date_from),
+             appointment.doctor_name.in_(item.doctor_names))
+        for item in items
+    ])
+
+
+def feature_rows_batch_query(items):
+    # Все записи, попадающие хотя бы в один элемент пакетного запроса, одним запросом
+    return _feature_rows_select().filter(_batch_filter(items))
+
+
+def batch_days_query(items):
+    # Только пары врач-день пакетного запроса: цена известна до потоковой выдачи строк
+    appointment = Appointment.Appointment
+    return select(appointment.doctor_name, appointment.appointment_date).distinct().filter(_batch_filter(items))
+
+
+def batch_models(items, doctor_name: str, appointment_date: datetime.date) -> list[int]:
+    # Модели элементов пакета, в которые попадает день врача; каждая модель - один раз
+    models = []
+    for item in items:
+        if (item.n_model not in models
+                and item.date_from <= appointment_date <= (item.date_to or item.date_from)
+                and doctor_name in item.doctor_names):
+            models.append(item.n_model)
+    return models
+
+
+def split_batch_rows(rows, items) -> dict[int, list]:
+    """
+    Раскладывает строки пакетного запроса по моделям: {n_model: [строки]}.
+    Строка, попавшая в несколько элементов с одной моделью, оценивается один раз.
+    """
+    date_idx = FEATURE_ROW_COLUMNS.index("appointment_date")
+    doctor_idx = FEATURE_ROW_COLUMNS.index("doctor_name")
+    by_model = defaultdict(list)
+    for row in rows:
+        for n_model in batch_models(items, row[doctor_idx], row[date_idx]):
+            by_model[n_model].append(row)
+    return by_model
+
+
+def row_fingerprint(row) -> bytes:
+    # Отпечаток всех колонок записи и пациента; стабилен между процессами, в отличие от hash()
+    return hashlib.blake2b(repr(tuple(row)).encode(), digest_size=16).digest()
+
+
+class PredictionCache:
+    """
+    Кэш прогнозов по отдельным записям перед моделью. Ключ - имя и версия
+    файла модели плюс отпечаток колонок записи и пациента, поэтому изменение
+    данных или замена модели дают новый ключ. Записи помечаются id пациента
+    для явной инвалидации при изменении пациента. Промахи считаются пулом inference.
+    """
+
+    # С какого числа строк отпечатки считаются в потоке, а не в event loop
+    THREAD_THRESHOLD = 1000
+
+    def __init__(self, backend: CacheBackend, inference: Inference):
+        self.backend = backend
+        self.inference = inference
+
+    def _lookup(self, rows, model: str) -> tuple[list, list]:
+        version = registry.get(model).version
+        keys = [(model, version, row_fingerprint(row)) for row in rows]
+        return keys, [self.backend.get(key) for key in keys]
+
+    async def predict(self, rows, model: str) -> list[dict]:
+        with stage("predict.cache_lookup"):
+            if len(rows) >= self.THREAD_THRESHOLD:
+                keys, results = await asyncio.to_thread(self._lookup, rows, model)
+            else:
+                keys, results = self._lookup(rows, model)
+
+        # Признаки и модель считаем только для записей, которых нет в кэше
+        missing = [i for i, record in enumerate(results) if record is None]
+        if missing:
+            patient_idx = FEATURE_ROW_COLUMNS.index("patient_id")
+            data = rows_to_columns([rows[i] for i in missing], FEATURE_ROW_COLUMNS)
+            timings = {}
+            with stage("predict.inference"):
+                records = await self.inference.predict(data, model, timings)
+            # Этапы внутри пула: ожидание батча, data_to_model и predict_proba (по всему батчу)
+            for name, seconds in timings.items():
+                observe_stage(f"inference.{name}", seconds)
+            for i, record in zip(missing, records):
+                self.backend.set(keys[i], record, tag=rows[i][patient_idx])
+                results[i] = record
+        return results
+
+    def invalidate_patient(self, patient_id) -> None:
+        self.backend.invalidate_tag(patient_id)
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def stats(self) -> dict:
+        return self.backend.stats()
+
+
+inference = Inference(settings.INFERENCE_WORKERS, settings.INFERENCE_MAX_BATCH, settings.INFERENCE_MAX_WAIT_MS)
+prediction_cache = PredictionCache(MemoryBackend(settings.PREDICTION_CACHE_SIZE, settings.PREDICTION_CACHE_TTL), inference)
+
+
+def stored_record(features: tuple, probability_visit: float, predict_visit: str) -> dict:
+    # Тот же вид, что и у predict_model: колонки записи, даты как datetime, затем прогноз
+    record = dict(zip(APPOINTMENT_COLUMNS, features))
+    for col in ("appointment_date", "scheduled_date"):
+        record[col] = datetime.datetime.combine(record[col], datetime.time())
+    record["probability_visit"] = probability_visit
+    record["predict_visit"] = predict_visit
+    return record
+
+
+async def predict_stored(rows, model: str) -> list[dict]:
+    """
+    Прогноз по строкам stored_feature_rows_query: ночной прогноз отдается, если
+    он посчитан текущей версией модели по тем же признакам, остальные строки
+    (новые или изменившиеся записи) считаются как обычно.
+    """
+    n_features = len(FEATURE_ROW_COLUMNS)
+    version = registry.get(model).version
+    results, missing = [None] * len(rows), []
+    with stage("predict.stored"):
+        for i, row in enumerate(rows):
+            row = tuple(row)
+            features = row[:n_features]
+            fingerprint, model_version, probability_visit, predict_visit = row[n_features:]
+            if model_version == version and fingerprint == row_fingerprint(features):
+                results[i] = stored_record(features, probability_visit, predict_visit)
+            else:
+                missing.append(i)
+
+    if missing:
+        live = await prediction_cache.predict([tuple(rows[i])[:n_features] for i in missing], model)
+        for i, record in zip(missing, live):
+            results[i] = record
+    return results
+
+
+def stream_predictions_ndjson(query, model: str, transaction_id: int, chunk_size: int):
+    """
+    Потоковый прогноз: записи читаются из курсора порциями по chunk_size, каждая
+    порция оценивается пулом inference и сразу уходит клиенту строками NDJSON. Резерв
+    transaction_id проводится после последней порции; при ошибке или обрыве
+    соединения средства возвращаются. Об ошибке сообщает последняя строка {"detail": ...}.
+    """
+    return _stream_ndjson(query, lambda rows: prediction_cache.predict(rows, model), transaction_id, chunk_size)
+
+
+def stream_batch_predictions_ndjson(query, items, models: dict[int, str], transaction_id: int, chunk_size: int):
+    """
+    Потоковый пакетный прогноз по feature_rows_batch_query: порция раскладывается
+    по моделям элементов пакета, у каждой строки прогноза - номер модели n_model.
+    """
+    async def predict_chunk(rows):
+        predictions = []
+        for n_model, model_rows in split_batch_rows(rows, items).items():
+            records = await prediction_cache.predict(model_rows, models[n_model])
+            # Записи из кэша общие, номер модели добавляется в копию
+            predictions.extend({**record, "n_model": n_model} for record in records)
+        return predictions
+
+    return _stream_ndjson(query, predict_chunk, transaction_id, chunk_size)
+
+
+async def _stream_ndjson(query, predict_chunk, transaction_id: int, chunk_size: int):
+    succeeded = False
+    try:
+        async with async_session_maker() as session:
+            result = await session.stream(query.execution_options(yield_per=chunk_size))
+            async for rows in result.partitions():
+                predictions = await predict_chunk(rows)
+                yield ndjson_lines(predictions)
+        succeeded = True
+    except Exception as e:
+        yield ndjson_lines([{"detail": f"Ошибка предсказания: {e}"}])
+    finally:
+        # shield: при обрыве соединения генератор отменяется, а биллинг должен завершиться
+        await asyncio.shield(billing_queue.finalize(transaction_id, succeeded))
+
+
+@event.listens_for(Patient.Patient, "after_update")
+@event.listens_for(Patient.Patient, "after_delete")
+def _invalidate_patient(mapper, connection, target):
+    prediction_cache.invalidate_patient(target.patient_id)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _invalidate_bulk_patients(orm_execute_state):
+    # Массовый UPDATE/DELETE по пациентам - id неизвестны, сбрасываем кэш целиком
+    if ((orm_execute_state.is_update or orm_execute_state.is_delete)
+            and orm_execute_state.bind_mapper is Patient.Patient.__mapper__):
+        prediction_cache.clear()
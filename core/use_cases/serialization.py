@@ -0,0 +1,26 @@
+"""
+Выдача ответов без поэлементной проверки pydantic и jsonable_encoder: строки
+запроса (кортежи SQLAlchemy) и записи прогнозов кодируются orjson сразу в байты.
+Вид ответа тот же, что у response_model маршрута (он остается для OpenAPI):
+поля в порядке модели, даты и время в ISO 8601, текст в UTF-8. Числа меньше
+1e-4 orjson пишет без экспоненты (0.00005 вместо 5e-05) - значение то же.
+"""
+import orjson
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+
+def rows_to_dicts(rows, model: type[BaseModel]) -> list[dict]:
+    # Колонки запроса идут в порядке полей модели (см. appointments_query)
+    fields = list(model.model_fields)
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def json_response(content, headers: dict | None = None) -> ORJSONResponse:
+    # Готовый Response FastAPI отдает как есть, заголовки передаются в него явно
+    return ORJSONResponse(content, headers=headers)
+
+
+def ndjson_lines(records) -> bytes:
+    # Порция потоковой выдачи: по одному JSON объекту на строку
+    return b"".join(orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE) for record in records)
@@ -0,0 +1,125 @@
+"""
+Клиент API для Streamlit: один requests.Session с пулом keep-alive соединений
+на процесс и кэш ответов (записи по дате и врачу, баланс по токену). Записи и
+прогнозы запрашиваются условно (If-None-Match): на 304 используется прежний ответ.
+"""
+import os
+import threading
+import urllib.parse
+from collections import OrderedDict
+from http.cookiejar import DefaultCookiePolicy
+import requests
+from requests.adapters import HTTPAdapter
+import streamlit as st
+
+FASTAPI_URL = os.getenv("FASTAPI_URL", "http://fastapi_server:8000")
+
+POOL_SIZE = 20          # Соединений с API, которые держит процесс
+TIMEOUT = 30            # Таймаут запроса к API, секунд
+APPOINTMENTS_TTL = 60   # Время жизни записей в кэше, секунд
+BALANCE_TTL = 30        # Время жизни баланса в кэше, секунд
+ETAG_STORE_SIZE = 256   # Ответов с ETag, которые хранятся для условных запросов
+
+MODELS = {'Регрессия (5)': 1, 'Бустинг (10)': 2}
+
+
+@st.cache_resource
+def http_session() -> requests.Session:
+    # Один Session на процесс: соединения с API не открываются заново на каждый клик
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    # Session общий для всех пользователей, поэтому cookie из ответов (токен после /login)
+    # в нем не сохраняются: токен передается явно в каждом запросе
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    return session
+
+
+class ResponseStore:
+    """Последние ответы с ETag: ключ (адрес и, для платных ответов, токен) -> (ETag, тело)."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                self._data.move_to_end(key)
+            return item
+
+    def set(self, key, etag: str, body) -> None:
+        with self._lock:
+            self._data[key] = (etag, body)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+@st.cache_resource
+def response_store() -> ResponseStore:
+    return ResponseStore(ETAG_STORE_SIZE)
+
+
+def _cookies(token: str) -> dict:
+    return {"users_access_token": token}
+
+
+def _conditional_get(key, url: str, **kwargs) -> tuple[requests.Response, object]:
+    # GET с If-None-Match по сохраненному ETag; на 304 тело берется из сохраненного ответа
+    stored = response_store().get(key)
+    headers = {"If-None-Match": stored[0]} if stored is not None else {}
+    response = http_session().get(url, headers=headers, timeout=TIMEOUT, **kwargs)
+    if response.status_code == 304 and stored is not None:
+        return response, stored[1]
+    response.raise_for_status()
+    body = response.json()
+    if "ETag" in response.headers:
+        response_store().set(key, response.headers["ETag"], body)
+    return response, body
+
+
+@st.cache_data(ttl=APPOINTMENTS_TTL, show_spinner=False)
+def get_appointments(date, doctor_name):
+    url = f"{FASTAPI_URL}/get_appointments/{date.day}/{date.month}/{date.year}"
+    params = {"doctor_name": None if doctor_name == "Все сотрудники" else doctor_name}
+    _, body = _conditional_get((url, params["doctor_name"]), url, params=params)
+    return body
+
+
+@st.cache_data(ttl=BALANCE_TTL, show_spinner=False)
+def get_balance(token: str) -> str:
+    response = http_session().get(f"{FASTAPI_URL}/balance/", cookies=_cookies(token), timeout=TIMEOUT)
+    response.raise_for_status()
+    return response.text.strip()
+
+
+def get_predict(date, doctor_name, model_name, token: str) -> tuple[list, str]:
+    """Прогноз и баланс после списания за него (на 304 - прежний прогноз без списания)."""
+    doctor_name_encoded = urllib.parse.quote(doctor_name)
+    url = f"{FASTAPI_URL}/predict/{date.day}/{date.month}/{date.year}/{doctor_name_encoded}/{MODELS[model_name]}"
+    charged = True
+    try:
+        response, body = _conditional_get((url, token), url, cookies=_cookies(token))
+        charged = response.status_code != 304
+    finally:
+        # Баланс мог измениться (списание или возврат): закэшированный больше не верен
+        if charged:
+            get_balance.clear(token)
+
+    # Баланс после списания приходит в заголовке ответа, отдельный запрос не нужен
+    balance = response.headers.get("X-Balance")
+    if balance is None:
+        balance = get_balance(token)
+    return body, balance
+
+
+def login(email: str, password: str) -> requests.Response:
+    return http_session().post(f"{FASTAPI_URL}/login/", json={"email": email, "password": password}, timeout=TIMEOUT)
+
+
+def register(payload: dict) -> requests.Response:
+    return http_session().post(f"{FASTAPI_URL}/registration/", json=payload, timeout=TIMEOUT)
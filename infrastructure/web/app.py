@@ -3,9 +3,7 @@ import pandas as pd
 import numpy as np
 import datetime
 import requests
-import urllib.parse
-
-FASTAPI_URL = "http://fastapi_server:8000"
+import api_client
 
 # Флаг для показа кнопки входа
 if 'show_login' not in st.session_state:
@@ -28,48 +26,26 @@ def get_cookies():
     return cookies
 
 def get_appointments(date, doctor_name):
-    day = date.day
-    month = date.month
-    year = date.year
-    url = f"{FASTAPI_URL}/get_appointments/{day}/{month}/{year}"
-    
-    # Параметры запроса, если нужны
-    if doctor_name == "Все сотрудники":
-        doctor_name = None
-    params = {"doctor_name": doctor_name}
-    
     try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()   # Если статус-код не 200, выбросит исключение
-        data = response.json()        # Преобразуем JSON данные в словарь
-        return data
+        # Ответ кэшируется по дате и врачу (api_client.APPOINTMENTS_TTL)
+        return api_client.get_appointments(date, doctor_name)
     except requests.exceptions.HTTPError as http_err:
         print(f"HTTP-ошибка: {http_err}")
     except Exception as err:
         print(f"Ошибка запроса: {err}")
 
 def get_balance():
-    cookies = get_cookies()
-    url = f"{FASTAPI_URL}/balance"
-    response = requests.get(url, cookies=cookies)
-    response.raise_for_status() 
-    balance = response.text.strip()
-    return balance
+    if get_cookies() is None:
+        return None
+    # Баланс кэшируется по токену и сбрасывается после каждого прогноза
+    return api_client.get_balance(st.session_state["jwt_token"])
 
 def get_predict(date, doctor_name, model_name):
-    models = {'Регрессия (5)': 1, 'Бустинг (10)': 2}
-    day = date.day
-    month = date.month
-    year = date.year
-    doctor_name_encoded = urllib.parse.quote(doctor_name)
-    url = f"{FASTAPI_URL}/predict/{day}/{month}/{year}/{doctor_name_encoded}/{models[model_name]}"
-
-    cookies = get_cookies()
-
+    if get_cookies() is None:
+        return None
     try:
-        response = requests.get(url, cookies=cookies)
-        response.raise_for_status()   # Если статус-код не 200, выбросит исключение
-        data = response.json()        # Преобразуем JSON данные в словарь
+        data, st.session_state["balance"] = api_client.get_predict(date, doctor_name, model_name,
+                                                                    st.session_state["jwt_token"])
         return data
     except requests.exceptions.HTTPError as http_err:
         st.error(f"HTTP-ошибка: {http_err}")
@@ -84,8 +60,7 @@ def login_user(email: str, password: str) -> bool:
     Отправляет данные для входа на сервер и сохраняет токен в session_state,
     если авторизация прошла успешно.
     """
-    login_payload = {"email": email, "password": password}
-    response = requests.post(f"{FASTAPI_URL}/login", json=login_payload)
+    response = api_client.login(email, password)
     if response.status_code == 200:
         token = response.json().get("access_token")
         if token:
@@ -114,7 +89,7 @@ def process_registration():
         return
 
     register_payload = {"email": reg_email, "password": reg_password, "first_name": first_name, "last_name": last_name}
-    response = requests.post(f"{FASTAPI_URL}/registration/", json=register_payload)
+    response = api_client.register(register_payload)
     if response.status_code in [200, 201]:
         st.success("Регистрация прошла успешно! Теперь вы можете авторизоваться.")
         # После успешной регистрации переключаемся на форму входа
@@ -128,8 +103,7 @@ def process_login():
     email = st.session_state.get("login_email")
     password = st.session_state.get("login_password")
     if email and password:
-        login_payload = {"email": email, "password": password}
-        response = requests.post(f"{FASTAPI_URL}/login", json=login_payload)
+        response = api_client.login(email, password)
         if response.status_code == 200:
             token = response.json().get("access_token")
             if token:
@@ -214,8 +188,8 @@ def main():
 
         with col_right:
             if st.button("Получить прогноз"):    
+                # Баланс после списания приходит вместе с прогнозом
                 predict = get_predict(selected_date, selected_employee, selected_model)
-                st.session_state["balance"] = get_balance()
                 balance_placeholder.write(f'Ваш баланс: {st.session_state["balance"]}')
                 df = pd.DataFrame(predict)
                 df = df[['slot_id', 'appointment_id', 'probability_visit', 'predict_visit']]
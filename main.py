@@ -1,13 +1,81 @@
-from fastapi import FastAPI, HTTPException, status, Response, Depends
-from core.entities import User, Appointment, Patient, Transaction
+from fastapi import FastAPI, HTTPException, status, Response, Depends, BackgroundTasks, Query, Header
+from fastapi.responses import StreamingResponse
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+from core.entities import User, Appointment, Prediction
 import datetime
-from config.database import async_session_maker
-from sqlalchemy import select, func
-from models.models import predict_model
+from config.database import get_session, pool_stats
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from config.app_settings import settings as app_settings
+from models.registry import registry, models_dict
 import asyncio
-from core.use_cases.auth import get_password_hash, verify_password, create_access_token, get_current_user
+from contextlib import asynccontextmanager
+from core.use_cases.auth import password_hasher, needs_rehash, rehash_password, create_access_token, get_current_user
+from core.use_cases import billing, features, precompute
+from core.use_cases.billing_queue import billing_queue
+from core.use_cases.metrics import MetricsMiddleware, register_stats, stage
+from core.use_cases.appointments import appointments_query, stream_appointments_ndjson
+from core.use_cases.etags import schedule_etag, etag_matches
+from core.use_cases.serialization import rows_to_dicts, json_response
+from core.use_cases.predict import feature_rows_query, feature_rows_batch_query, batch_days_query, batch_models, split_batch_rows, prediction_cache, inference, FEATURE_ROW_COLUMNS, stream_predictions_ndjson, stream_batch_predictions_ndjson
+from core.use_cases.predict import stored_feature_rows_query, predict_stored
 
-app = FastAPI()
+prices = {1: 5, 2: 10}
+
+
+async def warmup():
+    # Пул процессов для моделей: каждый процесс держит свои загруженные модели.
+    # Основному процессу при этом нужны только версии моделей (ключ кэша), без распаковки
+    await asyncio.to_thread(registry.load_all, models_dict.values(), inference.workers == 0)
+    await asyncio.to_thread(inference.start, models_dict.values())
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Модели загружаются в фоне: API отвечает сразу после старта, /ready - после прогрева
+    app.state.warmup_task = asyncio.create_task(warmup())
+    # Очередь итогов списаний; журналы остановившихся процессов применяются до первого запроса
+    await billing_queue.start()
+    # Периодическая сверка материализованных балансов с журналом транзакций
+    reconcile_task = None
+    if app_settings.BALANCE_RECONCILE_INTERVAL > 0:
+        reconcile_task = asyncio.create_task(billing.reconcile_periodically(app_settings.BALANCE_RECONCILE_INTERVAL,
+                                                                            app_settings.BILLING_PENDING_TIMEOUT,
+                                                                            lambda: billing_queue.replay(strict=True)))
+    # Периодический учет новых исходов приемов в признаках пациентов
+    features_task = None
+    if app_settings.PATIENT_FEATURES_INTERVAL > 0:
+        features_task = asyncio.create_task(features.refresh_periodically(app_settings.PATIENT_FEATURES_INTERVAL))
+    # Ночной расчет прогнозов на ближайшие дни
+    precompute_task = None
+    if app_settings.PREDICTION_PRECOMPUTE_HOUR >= 0:
+        precompute_task = asyncio.create_task(precompute.precompute_nightly(app_settings.PREDICTION_PRECOMPUTE_HOUR,
+                                                                            app_settings.PREDICTION_HORIZON_DAYS))
+    yield
+    if reconcile_task is not None:
+        reconcile_task.cancel()
+    if features_task is not None:
+        features_task.cancel()
+    if precompute_task is not None:
+        precompute_task.cancel()
+    app.state.warmup_task.cancel()
+    # Сначала досчитываются предсказания: их итоги списаний попадают в очередь до ее остановки
+    await inference.shutdown()
+    await billing_queue.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(MetricsMiddleware, slow_request_ms=app_settings.SLOW_REQUEST_MS)
+
+# Состояние пулов и кэшей снимается при каждом чтении /metrics
+register_stats({
+    "db_pool": pool_stats,
+    "prediction_cache": prediction_cache.stats,
+    "password_hasher": password_hasher.stats,
+    "inference": inference.stats,
+    "billing_queue": billing_queue.stats,
+})
 
 
 @app.get("/")
@@ -15,80 +83,139 @@ def home_page():
     return {"massage": "Информационная система прогнозирования посещений"}
 
 
-@app.get("/get_appointments/{day}/{month}/{year}")
+@app.get("/health")
+def health():
+    # Процесс жив и обрабатывает запросы
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+def ready(response: Response):
+    # Готовность принимать прогнозы: модели загружены, пул inference запущен
+    warmup_task = app.state.warmup_task
+    if not warmup_task.done():
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        return {"status": "warming up"}
+    if warmup_task.exception() is not None:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        return {"status": "error", "detail": str(warmup_task.exception())}
+    return {"status": "ready", "models": {name: registry.get(name).version for name in models_dict.values()}}
+
+
+@app.get("/stats/")
+def get_stats():
+    # Состояние пула соединений, кэшей и пула bcrypt
+    return {
+        "db_pool": pool_stats(),
+        "prediction_cache": prediction_cache.stats(),
+        "password_hasher": password_hasher.stats(),
+        "inference": inference.stats(),
+    }
+
+
+@app.get("/metrics")
+def metrics():
+    # Метрики в формате Prometheus: задержки запросов и этапов, пулы и кэши
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+@app.get("/get_appointments/{day}/{month}/{year}", response_model=list[Appointment.AppointmentInDB])
 async def get_appointments(day: int, 
                            month: int, 
                            year: int, 
-                           doctor_name: str | None = None, 
-                           ) -> list[Appointment.AppointmentInDB]:
+                           doctor_name: list[str] | None = Query(None),
+                           date_to: datetime.date | None = None,
+                           after_id: int | None = None,
+                           limit: int | None = Query(None, ge=1, le=10_000),
+                           stream: bool = False,
+                           if_none_match: str | None = Header(None),
+                           session: AsyncSession = Depends(get_session),
+                           ):
     
     # Проверка корректности даты
     try:
         target_date = datetime.date(year, month, day)
     except ValueError as error:
         raise HTTPException(status_code=400, detail=f"Передана некорректная дата: {error}")
+    if date_to is not None and date_to < target_date:
+        raise HTTPException(status_code=400, detail="Конец периода раньше его начала")
     
-    # Обращение к базе
-    async with async_session_maker() as session:
-        # Запрос по дате записи
-        query = select(Appointment.Appointment).filter(
-            Appointment.Appointment.appointment_date == target_date
-        )
-        # Если передан doctor, добавляем соответствующий фильтр
-        if doctor_name is not None:
-            query = query.filter(Appointment.Appointment.doctor_name == doctor_name)
-
-        result = await session.execute(query)
-        appointments = result.scalars().all()
+    # Запрос по дате (или периоду) приема и, если переданы, по врачам;
+    # doctor_name можно передать несколько раз
+    query = appointments_query(target_date, date_to, doctor_name, after_id, limit)
+
+    # Потоковая выдача NDJSON: первые строки уходят сразу, память не зависит от объема
+    if stream:
+        return StreamingResponse(stream_appointments_ndjson(query), media_type="application/x-ndjson")
+
+    # Расписание не менялось с прошлого запроса клиента - 304 без чтения записей
+    etag = await schedule_etag(session, target_date, date_to or target_date, doctor_name, after_id, limit)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    result = await session.execute(query)
+    appointments = result.all()
 
     if not appointments:
         raise HTTPException(status_code=404, detail="Записи не найдены")
+
+    headers = {"ETag": etag}
+
+    # Полная страница - курсор для следующей передается в заголовке
+    if limit is not None and len(appointments) == limit:
+        headers["X-Next-Cursor"] = str(appointments[-1].appointment_id)
     
-    return appointments
+    # Строки запроса кодируются сразу в JSON, без проверки каждой через AppointmentInDB
+    return json_response(rows_to_dicts(appointments, Appointment.AppointmentInDB), headers)
 
 
 @app.post("/registration/")
-async def register_user(user_data: User.UserCreate) -> dict:
+async def register_user(user_data: User.UserCreate, session: AsyncSession = Depends(get_session)) -> dict:
+    user_exists = HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail='Пользователь уже существует'
+    )
     # Проверка существования пользователя по email
-    async with async_session_maker() as session:
-        user = select(User.User).filter(User.User.email == user_data.email) 
-        result = (await session.execute(user)).scalars().first()
+    user = select(User.User).filter(User.User.email == user_data.email) 
+    result = (await session.execute(user)).scalars().first()
+    # Соединение не держим на время хеширования пароля (транзакция чтения завершается)
+    await session.close()
     if result:
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail='Пользователь уже существует'
-        )
+        raise user_exists
     # Преобразуем модель Pydantic в словарь
     user_data = user_data.model_dump()
-    async with async_session_maker() as session:
-        async with session.begin():
-            # Захешировать пароль, удалить открытый пароль из словаря
-            user_data['hashed_password'] = get_password_hash(user_data['password'])
-            del user_data['password']
-            # Создаем экземпляр пользователя
-            user_instance = User.User(**user_data)
-            session.add(user_instance)
-            await session.flush() #await session.commit()
-            
-            # Создаем транзакцию для нового пользователя
-            transaction_instance = Transaction.Transaction(
-                user_id=user_instance.user_id, 
-                amount=100,
-                status="completed"
-            )
-            session.add(transaction_instance)
+    # Захешировать пароль (в пуле bcrypt, без открытой транзакции), удалить открытый пароль из словаря
+    user_data['hashed_password'] = await password_hasher.hash(user_data['password'])
+    del user_data['password']
+    # Создаем экземпляр пользователя
+    user_instance = User.User(**user_data)
+    session.add(user_instance)
+    try:
+        await session.flush()
+        # Создаем стартовое пополнение и кошелек для нового пользователя
+        await billing.credit(session, user_instance.user_id, 100)
+        await session.commit()
+    except IntegrityError:
+        # Тот же email успели зарегистрировать параллельно, пока хешировался пароль
+        await session.rollback()
+        raise user_exists
 
     return {'message': 'Вы успешно зарегистрированы!'}
 
 
 @app.post("/login/")
-async def auth_user(response: Response, user_data: User.UserAuth):
-    async with async_session_maker() as session:
-        user = select(User.User).filter(User.User.email == user_data.email) 
-        result = (await session.execute(user)).scalars().first()
-    if not result or verify_password(plain_password=user_data.password, hashed_password=result.hashed_password) is False:
+async def auth_user(response: Response, user_data: User.UserAuth, background_tasks: BackgroundTasks,
+                    session: AsyncSession = Depends(get_session)):
+    user = select(User.User).filter(User.User.email == user_data.email) 
+    result = (await session.execute(user)).scalars().first()
+    # Соединение не держим на время проверки пароля
+    await session.close()
+    if not result or await password_hasher.verify(plain_password=user_data.password, hashed_password=result.hashed_password) is False:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                             detail='Неверная почта или пароль')
+    # Обновление устаревшего хэша выполняется уже после ответа
+    if needs_rehash(result.hashed_password):
+        background_tasks.add_task(rehash_password, result.user_id, user_data.password)
     access_token = create_access_token({"sub": str(result.user_id)})
     response.set_cookie(key="users_access_token", value=access_token, httponly=True)
     return {'access_token': access_token, 'refresh_token': None}
@@ -106,81 +233,182 @@ async def logout_user(response: Response):
 
 
 @app.get("/balance/")
-async def get_balance(user: dict = Depends(get_me)):
-    async with async_session_maker() as session:
-        query = select(func.coalesce(func.sum(Transaction.Transaction.amount), 0)).where(
-            Transaction.Transaction.user_id == user["user_id"],
-            Transaction.Transaction.status.in_(["completed", "pending"])
-        )
-        result = await session.execute(query)
-        balance = result.scalar()  # Если транзакций нет, вернёт None, поэтому используем coalesce для замены на 0.
-    return float(balance)
-
-
-@app.get("/predict/{day}/{month}/{year}/{doctor_name}/{n_model}")
+async def get_balance(user: dict = Depends(get_me), session: AsyncSession = Depends(get_session)):
+    # Баланс хранится в кошельке и обновляется вместе с транзакциями
+    with stage("balance.wallet"):
+        balance = await billing.get_wallet_balance(session, user["user_id"])
+    return balance
+
+
+@app.get("/predict/{day}/{month}/{year}/{doctor_name}/{n_model}", response_model=list[Prediction.PredictionOut])
 async def get_predict(day: int, 
                       month: int, 
                       year: int, 
                       doctor_name: str,
                       n_model: int | None = 1,
+                      stream: bool = False,
+                      if_none_match: str | None = Header(None),
                       user: dict = Depends(get_me),
-                      balance: float = Depends(get_balance)):
-    
-    prices = {1: 5, 2: 10}
-    models_dict = {1: "model_log_reg.pkl", 2: "model_xgb_gs.pkl"}
+                      session: AsyncSession = Depends(get_session)):
 
     # Проверка корректности даты
     try:
         target_date = datetime.date(year, month, day)
     except ValueError as error:
         raise HTTPException(status_code=400, detail=f"Передана некорректная дата: {error}")
+    if n_model not in models_dict:
+        raise HTTPException(status_code=400, detail=f"Неизвестная модель: {n_model}")
 
-    data = []
-    # Получение записей
-    async with async_session_maker() as session:
+    if stream:
+        return await stream_predict(session, user["user_id"], target_date, doctor_name, n_model)
 
-        query = select(Appointment.Appointment).filter(
-            Appointment.Appointment.appointment_date == target_date, 
-            Appointment.Appointment.doctor_name == doctor_name
-        )
+    # Записи, пациенты и модель не менялись - у клиента тот же прогноз: 304 без расчета и списания
+    model = models_dict[n_model]
+    with stage("predict.etag"):
+        etag = await schedule_etag(session, target_date, target_date, [doctor_name], model, registry.get(model).version)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
 
-        result = await session.execute(query)
-        appointments = result.scalars().all()
-  
-    if not appointments:
+    # Получение записей вместе с данными пациентов и ночными прогнозами одним запросом
+    with stage("predict.feature_rows"):
+        result = await session.execute(stored_feature_rows_query(target_date, doctor_name, model))
+        rows = result.all()
+
+    if not rows:
+        raise HTTPException(status_code=404, detail="Записи не найдены")
+
+    # Резервируем средства (транзакция со статусом PENDING) одним оператором и сразу фиксируем:
+    # прогноз считается без открытой транзакции БД и без занятого соединения
+    with stage("predict.reserve"):
+        reservation = await billing.reserve(session, user["user_id"], prices[n_model])
+        await session.commit()
+    if reservation is None:
+        raise HTTPException(status_code=400, detail="Недостаточно средств")
+    transaction_id, balance = reservation
+
+    # Выполняем предсказание
+    error = None
+    succeeded = False
+    try:
+        with stage("predict.model"):
+            predictions = await predict_stored(rows, model)
+        succeeded = True
+    except Exception as e:
+        error = e
+    finally:
+        # Итог резерва - в очередь групповой записи; при ошибке или отмене запроса средства возвращаются
+        with stage("predict.charge"):
+            await asyncio.shield(billing_queue.finalize(transaction_id, succeeded))
+
+    if error is not None:
+        raise HTTPException(status_code=500, detail=f"Ошибка предсказания: {error}")
+
+    # Баланс после списания - в заголовке, клиенту не нужен отдельный запрос /balance
+    return json_response(predictions, {"X-Balance": str(balance), "ETag": etag})
+
+async def stream_predict(session: AsyncSession, user_id: int, target_date: datetime.date, doctor_name: str, n_model: int):
+    # Потоковый режим: записи не собираются в память целиком, прогнозы уходят порциями (NDJSON)
+    query = feature_rows_query(target_date, doctor_name)
+    if (await session.execute(query.limit(1))).first() is None:
         raise HTTPException(status_code=404, detail="Записи не найдены")
 
-    async with async_session_maker() as session:
-        async with session.begin():
-            if prices[n_model] > balance:
-                raise HTTPException(status_code=400, detail="Недостаточно средств")
-            
-            # Создаем запись транзакции со статусом PENDING
-            transaction = Transaction.Transaction(
-                user_id=user["user_id"],
-                amount=-prices[n_model],
-                status="pending"
-            )
-            session.add(transaction)
-            await session.flush()
-
-            # Получение данных по пациентам
-            for appt in appointments:
-                patient_query = select(Patient.Patient).filter(Patient.Patient.patient_id == appt.patient_id)
-                patient_result = await session.execute(patient_query)
-                patient_record = patient_result.scalars().first()
-
-                row = Appointment.AppointmentInDB.model_validate(appt).model_dump()
-                row_add = Patient.PatientInDB.model_validate(patient_record).model_dump()
-                row.update(row_add)
-                data.append(row)
-
-            # Выполняем предсказание
-            try:
-                predictions = await asyncio.to_thread(predict_model, data, models_dict[n_model])
-                transaction.status = "completed"
-            except Exception as e:
-                transaction.status = "failed"
-                raise HTTPException(status_code=500, detail=f"Ошибка предсказания: {e}")
-   
-    return predictions     
\ No newline at end of file
+    # Резерв фиксируется до начала выдачи, проводится или возвращается по ее окончании
+    reservation = await billing.reserve(session, user_id, prices[n_model])
+    await session.commit()
+    if reservation is None:
+        raise HTTPException(status_code=400, detail="Недостаточно средств")
+    transaction_id, _ = reservation
+
+    return StreamingResponse(
+        stream_predictions_ndjson(query, models_dict[n_model], transaction_id,
+                                  app_settings.PREDICT_STREAM_CHUNK_SIZE),
+        media_type="application/x-ndjson"
+    )
+
+
+@app.post("/predict/batch/", response_model=list[Prediction.PredictBatchGroup])
+async def get_predict_batch(request: Prediction.PredictBatchRequest,
+                            stream: bool = False,
+                            user: dict = Depends(get_me),
+                            session: AsyncSession = Depends(get_session)):
+
+    for item in request.items:
+        if item.n_model not in models_dict:
+            raise HTTPException(status_code=400, detail=f"Неизвестная модель: {item.n_model}")
+        if item.date_to is not None and item.date_to < item.date_from:
+            raise HTTPException(status_code=400, detail="Дата окончания раньше даты начала")
+
+    if stream:
+        return await stream_predict_batch(session, user["user_id"], request.items)
+
+    # Все записи по всем врачам и датам запроса - одним запросом
+    result = await session.execute(feature_rows_batch_query(request.items))
+    rows = result.all()
+
+    if not rows:
+        raise HTTPException(status_code=404, detail="Записи не найдены")
+
+    rows_by_model = split_batch_rows(rows, request.items)
+
+    date_idx = FEATURE_ROW_COLUMNS.index("appointment_date")
+    doctor_idx = FEATURE_ROW_COLUMNS.index("doctor_name")
+    total_price = batch_price({(row[doctor_idx], row[date_idx]) for row in rows}, request.items)
+
+    # Одна сводная транзакция на весь пакет, фиксируется до расчета
+    reservation = await billing.reserve(session, user["user_id"], total_price)
+    await session.commit()
+    if reservation is None:
+        raise HTTPException(status_code=400, detail="Недостаточно средств")
+    transaction_id, _ = reservation
+
+    # Один вызов модели на все строки, относящиеся к ней
+    error = None
+    succeeded = False
+    try:
+        predictions = {}
+        for n_model, model_rows in rows_by_model.items():
+            predictions[n_model] = await prediction_cache.predict(model_rows, models_dict[n_model])
+        succeeded = True
+    except Exception as e:
+        error = e
+    finally:
+        await asyncio.shield(billing_queue.finalize(transaction_id, succeeded))
+
+    if error is not None:
+        raise HTTPException(status_code=500, detail=f"Ошибка предсказания: {error}")
+
+    groups = {}
+    for n_model, records in predictions.items():
+        for record in records:
+            key = (record["doctor_name"], record["appointment_date"].date(), n_model)
+            groups.setdefault(key, []).append(record)
+
+    return json_response([
+        {"doctor_name": doctor_name, "appointment_date": appointment_date, "n_model": n_model, "predictions": records}
+        for (doctor_name, appointment_date, n_model), records in sorted(groups.items())
+    ])
+
+def batch_price(days, items) -> int:
+    # Цена как у отдельных запросов: за каждую пару врач-день по каждой модели
+    return sum(prices[n_model]
+               for doctor_name, appointment_date in days
+               for n_model in batch_models(items, doctor_name, appointment_date))
+
+async def stream_predict_batch(session: AsyncSession, user_id: int, items: list[Prediction.PredictBatchItem]):
+    # Потоковый пакетный режим: строка NDJSON на запись с номером модели n_model, без группировки
+    days = (await session.execute(batch_days_query(items))).all()
+    if not days:
+        raise HTTPException(status_code=404, detail="Записи не найдены")
+
+    # Резерв фиксируется до начала выдачи, проводится или возвращается по ее окончании
+    reservation = await billing.reserve(session, user_id, batch_price(days, items))
+    await session.commit()
+    if reservation is None:
+        raise HTTPException(status_code=400, detail="Недостаточно средств")
+    transaction_id, _ = reservation
+
+    return StreamingResponse(
+        stream_batch_predictions_ndjson(feature_rows_batch_query(items), items, models_dict, transaction_id,
+                                        app_settings.PREDICT_STREAM_CHUNK_SIZE),
+        media_type="application/x-ndjson"
+    )
@@ -7,9 +7,27 @@ from sqlalchemy.ext.asyncio import async_engine_from_config
 
 from alembic import context
 
+import sys
+from os.path import dirname, abspath
+
+if sys.platform.startswith("win"):
+    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from config.database import DATABASE_URL, Base
+from core.entities.Appointment import Appointment
+from core.entities.Patient import Patient
+from core.entities.User import User
+from core.entities.Transaction import Transaction, Wallet
+from core.entities.Outcome import Outcome, Watermark
+from core.entities.Prediction import Prediction
+from core.entities.ScheduleVersion import ScheduleVersion
+
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
+config.set_main_option("sqlalchemy.url", DATABASE_URL)
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
@@ -20,7 +38,8 @@ if config.config_file_name is not None:
 # for 'autogenerate' support
 # from myapp import mymodel
 # target_metadata = mymodel.Base.metadata
-target_metadata = None
+# target_metadata = None
+target_metadata = Base.metadata
 
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
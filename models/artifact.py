@@ -0,0 +1,60 @@
+"""
+Файл весов модели для отображения в память: JSON заголовок (строковые и
+скалярные поля, раскладка массивов) и сырые массивы, выровненные по 64 байта.
+Массивы при загрузке не копируются (np.frombuffer поверх mmap), поэтому все
+процессы на машине, открывшие один файл, делят его страницы через page cache ОС.
+"""
+import json
+import math
+import mmap
+import os
+import numpy as np
+
+MAGIC = b"VFSMODEL"
+ALIGN = 64
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+def save_artifact(path: str, values: dict) -> None:
+    # Массивы NumPy - в бинарную часть, остальное (строки, списки, числа) - в заголовок
+    arrays = {name: np.ascontiguousarray(value) for name, value in values.items() if isinstance(value, np.ndarray)}
+    meta = {name: value for name, value in values.items() if not isinstance(value, np.ndarray)}
+
+    layout, offset = {}, 0
+    for name, array in arrays.items():
+        if array.dtype.hasobject:
+            raise ValueError(f"Массив {name} с dtype=object нельзя отобразить в память")
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset = _align(offset + array.nbytes)
+    header = json.dumps({"meta": meta, "arrays": layout}, ensure_ascii=False).encode()
+    data_start = _align(len(MAGIC) + 8 + len(header))
+
+    # Запись во временный файл и замена: процессы, уже отобразившие старый файл, продолжают его читать
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC + len(header).to_bytes(8, "little") + header)
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name]["offset"])
+            f.write(array.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+
+
+def load_artifact(path: str) -> dict:
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if buffer[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} не является файлом весов модели")
+    header_size = int.from_bytes(buffer[len(MAGIC):len(MAGIC) + 8], "little")
+    header = json.loads(buffer[len(MAGIC) + 8:len(MAGIC) + 8 + header_size])
+    data_start = _align(len(MAGIC) + 8 + header_size)
+
+    values = dict(header["meta"])
+    for name, spec in header["arrays"].items():
+        # Массив только для чтения, который ссылается на страницы mmap (буфер живет, пока жив массив)
+        values[name] = np.frombuffer(buffer, dtype=np.dtype(spec["dtype"]), count=math.prod(spec["shape"]),
+                                     offset=data_start + spec["offset"]).reshape(spec["shape"])
+    return values
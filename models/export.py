@@ -0,0 +1,181 @@
+"""
+Выгрузка обученных пайплайнов (логистическая регрессия, XGBoost) в файл весов
+для отображения в память (.mmap рядом с .pkl, формат - models/artifact.py),
+который считает models/scorer.py без sklearn и xgboost:
+    python -m models.export model_log_reg.pkl model_xgb_gs.pkl
+
+Перед записью выгрузка сверяется с исходным пайплайном на синтетических
+данных: вероятности должны совпасть (у деревьев - с точностью до младшего
+разряда float32, суммы листьев - побитно), иначе файл не записывается.
+"""
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import numpy as np
+from models.artifact import save_artifact
+from models.models import features_frame, numeric_features
+from models.registry import MODELS_DIR, models_dict
+from models.scorer import ArrayScorer, LinearScorer, TreeScorer
+
+PARITY_ROWS = 100000
+
+
+def flatten_preprocessor(preprocessor, source_version: str) -> dict:
+    # ColumnTransformer(StandardScaler, OneHotEncoder(drop='first'), LeaveOneOutEncoder)
+    scaler = preprocessor.named_transformers_["num"]
+    ohe = preprocessor.named_transformers_["ohe"]
+    looe = preprocessor.named_transformers_["looe"]
+
+    if list(preprocessor.transformers_[0][2]) != list(numeric_features):
+        raise ValueError("Порядок числовых признаков пайплайна не совпадает с numeric_features")
+    if ohe.drop != "first" or ohe.handle_unknown != "error" or len(ohe.categories_) != 1:
+        raise ValueError("Поддерживается только OneHotEncoder(drop='first') по одной колонке")
+    if looe.handle_unknown != "value" or looe.handle_missing != "value":
+        raise ValueError("Поддерживается только LeaveOneOutEncoder с handle_unknown/handle_missing='value'")
+
+    # Значение категории при transform без y: среднее по категории, для единичных - общее среднее
+    (loo_column, mapping), = looe.mapping.items()
+    loo_values = (mapping["sum"] / mapping["count"]).where(mapping["count"] > 1, looe._mean)
+
+    return {
+        "source_version": source_version,
+        "scaler_mean": scaler.mean_.astype(np.float64),
+        "scaler_scale": scaler.scale_.astype(np.float64),
+        "ohe_column": preprocessor.transformers_[1][2][0],
+        "ohe_categories": ohe.categories_[0].astype(str).tolist(),
+        "loo_column": loo_column,
+        "loo_default": float(looe._mean),
+        "loo_categories": mapping.index.to_numpy().astype(str).tolist(),
+        "loo_values": loo_values.to_numpy(np.float64),
+    }
+
+
+def flatten_linear(pipeline, source_version: str) -> dict:
+    regression = pipeline.named_steps["regression"]
+    if len(regression.classes_) != 2:
+        raise ValueError("Поддерживается только бинарная логистическая регрессия")
+    return {
+        "kind": LinearScorer.kind,
+        **flatten_preprocessor(pipeline.named_steps["preprocessor"], source_version),
+        "coef": regression.coef_.astype(np.float64),
+        "intercept": regression.intercept_.astype(np.float64),
+        "classes": regression.classes_,
+    }
+
+
+def flatten_trees(pipeline, source_version: str) -> dict:
+    classifier = pipeline.named_steps["xgb"]
+    model = json.loads(classifier.get_booster().save_raw("json"))["learner"]
+    if model["objective"]["name"] != "binary:logistic" or model["gradient_booster"]["name"] != "gbtree":
+        raise ValueError("Поддерживается только XGBoost gbtree с binary:logistic")
+    if int(model["learner_model_param"]["num_target"]) != 1 or len(classifier.classes_) != 2:
+        raise ValueError("Поддерживается только бинарная классификация")
+    trees = model["gradient_booster"]["model"]["trees"]
+
+    roots, feature, threshold, left, right, default_left, value = [], [], [], [], [], [], []
+    depth = 0
+    for tree in trees:
+        if any(tree["split_type"]) or tree["categories"]:
+            raise ValueError("Поддерживаются только числовые разбиения")
+        offset = len(feature)
+        roots.append(offset)
+        node_depth = [0] * len(tree["left_children"])
+        for i, (l, r) in enumerate(zip(tree["left_children"], tree["right_children"])):
+            if l == -1:
+                # Лист: ссылки на себя, значение листа хранится в split_conditions
+                feature.append(0), threshold.append(0.0), left.append(offset + i), right.append(offset + i)
+                value.append(tree["split_conditions"][i])
+            else:
+                feature.append(tree["split_indices"][i]), threshold.append(tree["split_conditions"][i])
+                left.append(offset + l), right.append(offset + r), value.append(0.0)
+                node_depth[l] = node_depth[r] = node_depth[i] + 1
+            default_left.append(bool(tree["default_left"][i]))
+        depth = max(depth, max(node_depth))
+
+    # base_score хранится вероятностью, деревья добавляются к ее логиту
+    base_score = np.float32(float(model["learner_model_param"]["base_score"].strip("[]")))
+    base_margin = -np.log(np.float32(1) / base_score - np.float32(1))
+
+    return {
+        "kind": TreeScorer.kind,
+        **flatten_preprocessor(pipeline.named_steps["preprocessor"], source_version),
+        "tree_roots": np.array(roots, dtype=np.int32),
+        "tree_feature": np.array(feature, dtype=np.int32),
+        "tree_threshold": np.array(threshold, dtype=np.float32),
+        "tree_left": np.array(left, dtype=np.int32),
+        "tree_right": np.array(right, dtype=np.int32),
+        "tree_default_left": np.array(default_left, dtype=bool),
+        "tree_value": np.array(value, dtype=np.float32),
+        "depth": depth,
+        "base_margin": float(base_margin),
+        "classes": np.asarray(classifier.classes_),
+    }
+
+
+def flatten_pipeline(pipeline, source_version: str) -> dict:
+    if "regression" in pipeline.named_steps:
+        return flatten_linear(pipeline, source_version)
+    if "xgb" in pipeline.named_steps:
+        return flatten_trees(pipeline, source_version)
+    raise ValueError(f"Неподдерживаемый пайплайн: {list(pipeline.named_steps)}")
+
+
+def synthetic_features(scorer: ArrayScorer, n: int, seed: int = 0) -> tuple[np.ndarray, dict]:
+    # Числовые признаки вокруг средних обучающей выборки; категории - известные, неизвестная и пустая
+    rng = np.random.default_rng(seed)
+    numeric = np.round(rng.normal(scorer.scaler_mean, scorer.scaler_scale * 2, (n, len(scorer.scaler_mean))))
+    neighbourhoods = np.array([*scorer.loo_table, "НЕИЗВЕСТНЫЙ РАЙОН", None], dtype=object)
+    categorical = {
+        scorer.ohe_column: rng.choice(np.array(scorer.ohe_categories, dtype=object), n),
+        scorer.loo_column: rng.choice(neighbourhoods, n),
+    }
+    return numeric, categorical
+
+
+def check_parity(pipeline, scorer: ArrayScorer, n: int = PARITY_ROWS) -> None:
+    numeric, categorical = synthetic_features(scorer, n)
+    frame = features_frame(numeric, categorical)
+    expected = pipeline.predict_proba(frame)
+    actual = scorer.predict_proba(numeric, categorical)
+    if expected.dtype != actual.dtype:
+        raise ValueError(f"Тип вероятностей выгрузки {actual.dtype}, у пайплайна {expected.dtype}")
+    # Допуск в младших разрядах большей из вероятностей строки: 1 - p наследует абсолютную ошибку p
+    tolerance = scorer.parity_ulps * np.spacing(expected.max(axis=1, keepdims=True))
+    if np.any(np.abs(expected - actual) > tolerance):
+        raise ValueError(f"Выгрузка расходится с пайплайном: max |diff| = {np.abs(expected - actual).max()}")
+    if isinstance(scorer, TreeScorer):
+        # Сумма листьев должна совпасть побитно, расхождение допустимо только в сигмоиде
+        booster = pipeline.named_steps["xgb"].get_booster()
+        expected_margin = booster.inplace_predict(pipeline.named_steps["preprocessor"].transform(frame),
+                                                  predict_type="margin")
+        if not np.array_equal(expected_margin, scorer.margin(numeric, categorical)):
+            raise ValueError("Суммы листьев выгрузки расходятся с XGBoost")
+    if not np.array_equal(pipeline.classes_, scorer.classes_):
+        raise ValueError("Классы выгрузки расходятся с пайплайном")
+
+
+def export_model(name: str, models_dir: str = MODELS_DIR, parity_rows: int = PARITY_ROWS) -> str:
+    path = os.path.join(models_dir, name)
+    with open(path, "rb") as f:
+        content = f.read()
+    pipeline = pickle.loads(content)
+    # Версия считается так же, как в ModelRegistry: по ней реестр проверяет, что выгрузка не устарела
+    version = hashlib.sha256(content).hexdigest()[:16]
+
+    values = flatten_pipeline(pipeline, version)
+    check_parity(pipeline, ArrayScorer.from_values(values), parity_rows)
+
+    export_path = os.path.splitext(path)[0] + ".mmap"
+    save_artifact(export_path, values)
+    return export_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Выгрузка моделей в файлы весов для отображения в память")
+    parser.add_argument("names", nargs="*", default=list(models_dict.values()), help="Файлы моделей в каталоге models")
+    parser.add_argument("--parity-rows", type=int, default=PARITY_ROWS, help="Строк для сверки с пайплайном")
+    args = parser.parse_args()
+    for name in args.names:
+        print(export_model(name, parity_rows=args.parity_rows))
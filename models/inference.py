@@ -0,0 +1,159 @@
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from models.models import predict_model
+from models.registry import registry
+
+
+def _init_worker(names) -> None:
+    # Каждый процесс пула один раз загружает модели в свой реестр
+    registry.load_all(names)
+
+
+def _predict_timed(data: dict, model: str) -> tuple[list[dict], dict]:
+    # predict_model в процессе пула вместе с длительностью этапов (для метрик основного процесса)
+    timings = {}
+    return predict_model(data, model, timings), timings
+
+
+class Inference:
+    """
+    Пул процессов для predict_proba с микробатчингом: строки параллельных
+    запросов к одной модели, пришедшие в пределах max_wait_ms, склеиваются в
+    один вызов модели (не больше max_batch строк, кроме одиночного большого
+    запроса), а результаты раздаются обратно по запросам. Процессы не делят
+    GIL с обработчиками запросов. При workers = 0 модель считается в потоке
+    основного процесса, микробатчинг сохраняется.
+    """
+
+    def __init__(self, workers: int, max_batch: int, max_wait_ms: float):
+        self.workers = workers
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._pool: ProcessPoolExecutor | None = None
+        self._names: list = []
+        self._pending: dict[str, list] = {}     # модель -> [(данные по колонкам, future, время постановки)]
+        self._pending_rows: dict[str, int] = {}
+        self._timers: dict[str, asyncio.TimerHandle] = {}
+        # Ссылки на задачи батчей: event loop хранит только слабые ссылки на задачи
+        self._tasks: set[asyncio.Task] = set()
+        self.batches = 0
+        self.requests = 0
+        self.rows = 0
+        self.busy_seconds = 0.0
+        self.failed_batches = 0
+        self.pool_restarts = 0
+
+    def _create_pool(self) -> ProcessPoolExecutor:
+        # spawn: дочерний процесс не наследует потоки и event loop родителя
+        return ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=_init_worker, initargs=(self._names,))
+
+    def start(self, names) -> None:
+        if self.workers > 0 and self._pool is None:
+            self._names = list(names)
+            self._pool = self._create_pool()
+            # Дожидаемся запуска всех процессов, чтобы первый запрос не ждал загрузку моделей
+            for future in [self._pool.submit(time.sleep, 0.1) for _ in range(self.workers)]:
+                future.result()
+
+    async def shutdown(self) -> None:
+        # Накопленные запросы досчитываются, начатые батчи дожидаются до остановки пула
+        for model in list(self._pending):
+            self._flush(model)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def _restart_pool(self, broken: ProcessPoolExecutor) -> None:
+        # Процесс пула завершился аварийно - пул больше не принимает задачи. Пересоздаем
+        # один раз: остальные запросы, получившие ошибку от того же пула, его уже не трогают
+        if self._pool is broken:
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._pool = self._create_pool()
+            self.pool_restarts += 1
+
+    async def predict(self, data: dict, model: str, timings: dict | None = None) -> list[dict]:
+        # data - колонки признаков {имя: список значений}, как для predict_model.
+        # В timings записываются ожидание в очереди и этапы predict_model (по всему батчу)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        n_rows = len(next(iter(data.values())))
+        self._pending.setdefault(model, []).append((data, future, time.perf_counter()))
+        self._pending_rows[model] = self._pending_rows.get(model, 0) + n_rows
+
+        if self._pending_rows[model] >= self.max_batch:
+            self._flush(model)
+        elif model not in self._timers:
+            self._timers[model] = loop.call_later(self.max_wait, self._flush, model)
+        records, batch_timings = await future
+        if timings is not None:
+            timings.update(batch_timings)
+        return records
+
+    def _flush(self, model: str) -> None:
+        timer = self._timers.pop(model, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(model, [])
+        self._pending_rows.pop(model, None)
+        if batch:
+            task = asyncio.ensure_future(self._run(batch, model))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list, model: str, retry_broken: bool = True) -> None:
+        # Склеиваем колонки запросов в один батч и запоминаем границы каждого запроса
+        columns = batch[0][0].keys()
+        data = {col: [value for request, _, _ in batch for value in request[col]] for col in columns}
+        sizes = [len(next(iter(request.values()))) for request, _, _ in batch]
+
+        start = time.perf_counter()
+        pool = self._pool
+        try:
+            loop = asyncio.get_running_loop()
+            records, timings = await loop.run_in_executor(pool, _predict_timed, data, model)
+        except Exception as e:
+            self.busy_seconds += time.perf_counter() - start
+            self.failed_batches += 1
+            if isinstance(e, BrokenProcessPool) and pool is not None:
+                self._restart_pool(pool)
+            if len(batch) > 1:
+                # Ошибка одного запроса не должна доставаться склеенным с ним:
+                # каждый запрос считается отдельно, ошибку получает только неудачный
+                await asyncio.gather(*(self._run([request], model, retry_broken) for request in batch))
+            elif isinstance(e, BrokenProcessPool) and retry_broken:
+                # Процесс мог упасть на чужом запросе - одна попытка на новом пуле
+                await self._run(batch, model, retry_broken=False)
+            else:
+                _, future, _ = batch[0]
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.busy_seconds += time.perf_counter() - start
+
+        self.batches += 1
+        self.requests += len(batch)
+        self.rows += sum(sizes)
+        offset = 0
+        for (_, future, enqueued), size in zip(batch, sizes):
+            if not future.done():
+                future.set_result((records[offset:offset + size], {**timings, "queue": start - enqueued}))
+            offset += size
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "batches": self.batches,
+            "requests": self.requests,
+            "rows": self.rows,
+            "requests_per_batch": self.requests / self.batches if self.batches else 0.0,
+            "busy_seconds": self.busy_seconds,
+            "failed_batches": self.failed_batches,
+            "pool_restarts": self.pool_restarts,
+            "pending_requests": sum(len(batch) for batch in self._pending.values()),
+        }
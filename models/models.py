@@ -1,78 +1,139 @@
-import pickle
-import pandas as pd
+import datetime
+import time
+from operator import itemgetter
 import numpy as np
-from sklearn.preprocessing import OneHotEncoder, MinMaxScaler, StandardScaler
-import category_encoders as ce
-from sklearn.compose import ColumnTransformer
-from sklearn.pipeline import Pipeline
-from sklearn.dummy import DummyClassifier
-from sklearn.linear_model import LogisticRegression
-import os
-
-def data_to_model(data) -> pd.DataFrame:
-    data = pd.DataFrame(data)
-    
-    cols_to_int = ['scholarship', 'hipertension','diabetes', 'alcoholism', 'handcap', 'sms_received']
-    data[cols_to_int] = data[cols_to_int].astype(int)
-  
-    mapping = {
-        'gender': 'Gender',
-        'age': 'Age',
-        'neighbourhood': 'Neighbourhood',
-        'scholarship': 'Scholarship',
-        'hipertension': 'Hipertension',
-        'diabetes': 'Diabetes',
-        'alcoholism': 'Alcoholism',
-        'handcap': 'Handcap',
-        'sms_received': 'SMS_received',
-        'appointment_cumcount': 'Appointment_cumcount'
-    }
-    data.rename(columns=mapping, inplace=True)
+from models.registry import registry
+from models.scorer import ArrayScorer
+
+# Признаки в порядке, в котором их ожидает обученный пайплайн
+colums_predict = ['Gender', 'Age', 'Neighbourhood', 'Scholarship', 'Hipertension', 'Diabetes', 'Alcoholism', 'Handcap', 'SMS_received', 
+                  'day_diff', 'Scheduled_dow', 'Scheduled_day', 'Scheduled_month', 'AppointmentDay_dow', 'AppointmentDay_day',
+                  'Appointment_cumcount', 'no_show_ratio',  'no_show_cumsum']
+
+# Числовые признаки (в порядке StandardScaler пайплайна) и колонки входных данных, из которых они берутся
+numeric_features = {
+    'Age': 'age',
+    'Scholarship': 'scholarship',
+    'Hipertension': 'hipertension',
+    'Diabetes': 'diabetes',
+    'Alcoholism': 'alcoholism',
+    'Handcap': 'handcap',
+    'SMS_received': 'sms_received',
+    'day_diff': None,
+    'Scheduled_dow': None,
+    'Scheduled_day': None,
+    'Scheduled_month': None,
+    'AppointmentDay_dow': None,
+    'AppointmentDay_day': None,
+    'no_show_cumsum': 'no_show_cumsum',
+    'Appointment_cumcount': 'appointment_cumcount',
+    'no_show_ratio': 'no_show_ratio',
+}
+numeric_index = {name: i for i, name in enumerate(numeric_features)}
+categorical_features = {'Gender': 'gender', 'Neighbourhood': 'neighbourhood'}
+
+colums_result = ["doctor_name", "slot_id", "patient_id", "appointment_id", "appointment_date", "scheduled_date", 
+                 "probability_visit", "predict_visit"]
+
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+answers = np.array(["Прием", "Пропуск"], dtype=object)
+
+
+def rows_to_columns(rows, columns) -> dict:
+    # Транспонирование строк из БД в колонки {имя: список значений}.
+    # itemgetter по колонкам не создает промежуточных кортежей-строк, как zip(*rows)
+    return {col: list(map(itemgetter(i), rows)) for i, col in enumerate(columns)}
+
 
-    data['appointment_date'] = pd.to_datetime(data['appointment_date'])
-    data['scheduled_date'] = pd.to_datetime(data['scheduled_date'])
-    data['day_diff'] = (data['appointment_date'] - data['scheduled_date']).dt.days
-    data['Scheduled_dow'] = data['scheduled_date'].dt.weekday
-    data['Scheduled_day'] = data['scheduled_date'].dt.day
-    data['Scheduled_month'] = data['scheduled_date'].dt.month
-    data['AppointmentDay_dow'] = data['appointment_date'].dt.weekday
-    data['AppointmentDay_day'] = data['appointment_date'].dt.day
+def _as_days(values) -> np.ndarray:
+    # Колонка дат -> datetime64[D]; даты из БД переводятся через toordinal, это быстрее разбора numpy
+    if len(values) and isinstance(values[0], datetime.date):
+        ordinals = np.fromiter(map(datetime.date.toordinal, values), dtype=np.int64, count=len(values))
+        return (ordinals - EPOCH_ORDINAL).astype('datetime64[D]')
+    return np.asarray(values, dtype='datetime64[D]')
 
-    return data
 
-def predict_model(data, model):
+def _date_parts(dates: np.ndarray):
+    # День недели, число и месяц для массива datetime64[D] (1970-01-01 - четверг)
+    months = dates.astype('datetime64[M]')
+    weekday = (dates.astype(np.int64) + 3) % 7
+    day = (dates - months.astype('datetime64[D]')).astype(np.int64) + 1
+    month = months.astype(np.int64) % 12 + 1
+    return weekday, day, month
 
-    # Загружаем предварительно обученную ML модель.
-    model_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), model)
 
-    try:
-        with open(model_path, "rb") as f:
-            ml_model = pickle.load(f)
-    except Exception as e:
-        raise Exception(f"Не удалось загрузить ML модель: {e}")
+def data_to_model(data: dict) -> tuple[np.ndarray, dict]:
+    """
+    Строит признаки из колоночных данных {колонка: значения}.
+    Возвращает матрицу числовых признаков (порядок numeric_features)
+    и словарь массивов категориальных признаков.
+    """
+    n = len(data['appointment_id'])
+    numeric = np.empty((n, len(numeric_features)), dtype=np.float64)
 
-    answers = ["Прием", "Пропуск"]
+    for name, source in numeric_features.items():
+        if source is not None:
+            numeric[:, numeric_index[name]] = np.fromiter(data[source], dtype=np.float64, count=n)
 
-    data = data_to_model(data)
+    appointment_date = _as_days(data['appointment_date'])
+    scheduled_date = _as_days(data['scheduled_date'])
+    numeric[:, numeric_index['day_diff']] = (appointment_date - scheduled_date).astype(np.int64)
 
-    colums_predict = ['Gender', 'Age', 'Neighbourhood', 'Scholarship', 'Hipertension', 'Diabetes', 'Alcoholism', 'Handcap', 'SMS_received', 
-                      'day_diff', 'Scheduled_dow', 'Scheduled_day', 'Scheduled_month', 'AppointmentDay_dow', 'AppointmentDay_day',
-                      'Appointment_cumcount', 'no_show_ratio',  'no_show_cumsum']
+    weekday, day, month = _date_parts(scheduled_date)
+    numeric[:, numeric_index['Scheduled_dow']] = weekday
+    numeric[:, numeric_index['Scheduled_day']] = day
+    numeric[:, numeric_index['Scheduled_month']] = month
 
-    predict_proba = ml_model.predict_proba(data[colums_predict])
-    data['probability_visit'] = predict_proba[:, 0]
-    data['predict_visit'] = [answers[i] for i in ml_model.predict(data[colums_predict])] 
+    weekday, day, _ = _date_parts(appointment_date)
+    numeric[:, numeric_index['AppointmentDay_dow']] = weekday
+    numeric[:, numeric_index['AppointmentDay_day']] = day
 
-    colums_result = ["doctor_name", "slot_id", "patient_id", "appointment_id", "appointment_date", "scheduled_date", 
-                     "probability_visit", "predict_visit"]
-    
-    result = data[colums_result].to_dict(orient="records")
+    categorical = {name: np.asarray(data[source], dtype=object) for name, source in categorical_features.items()}
+    return numeric, categorical
 
-    for record in result:
-        for key, value in record.items():
-            if isinstance(value, np.integer):
-                record[key] = int(value)
-            elif isinstance(value, np.floating):
-                record[key] = float(value)
 
-    return result
\ No newline at end of file
+def features_frame(numeric: np.ndarray, categorical: dict):
+    # DataFrame нужен только на входе sklearn пайплайна (ColumnTransformer выбирает колонки по именам).
+    # pandas, sklearn и category_encoders импортируются при первой распаковке модели, а не при старте API
+    import pandas as pd
+    columns = {name: categorical[name] if name in categorical else numeric[:, numeric_index[name]]
+               for name in colums_predict}
+    return pd.DataFrame(columns)
+
+
+def predict_model(data: dict, model, timings: dict | None = None):
+
+    # Берем предварительно обученную ML модель из реестра (загружена при старте)
+    ml_model = registry.get(model).estimator
+
+    start = time.perf_counter()
+    numeric, categorical = data_to_model(data)
+    features_done = time.perf_counter()
+
+    if isinstance(ml_model, ArrayScorer):
+        # Модель из файла весов (models/export.py): без pandas, sklearn и xgboost, вероятности те же
+        predict_proba = ml_model.predict_proba(numeric, categorical)
+    else:
+        predict_proba = ml_model.predict_proba(features_frame(numeric, categorical))
+
+    # Длительность этапов для метрик (timings заполняет вызывающий код, например пул inference)
+    if timings is not None:
+        timings["data_to_model"] = features_done - start
+        timings["predict_proba"] = time.perf_counter() - features_done
+    # Класс с наибольшей вероятностью - то же, что вернул бы ml_model.predict, но без второго прохода по пайплайну
+    predict_visit = answers[ml_model.classes_[predict_proba.argmax(axis=1)]]
+
+    # Даты отдаем как datetime, как и раньше при сериализации pd.Timestamp
+    result = {
+        "doctor_name": data["doctor_name"],
+        "slot_id": data["slot_id"],
+        "patient_id": data["patient_id"],
+        "appointment_id": data["appointment_id"],
+        "appointment_date": _as_days(data["appointment_date"]).astype('datetime64[us]').tolist(),
+        "scheduled_date": _as_days(data["scheduled_date"]).astype('datetime64[us]').tolist(),
+        "probability_visit": predict_proba[:, 0].tolist(),
+        "predict_visit": predict_visit.tolist(),
+    }
+
+    return [dict(zip(colums_result, values)) for values in zip(*result.values())]
@@ -0,0 +1,131 @@
+import hashlib
+import os
+import pickle
+import threading
+from models.scorer import ArrayScorer
+
+MODELS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Номер модели в API -> файл модели
+models_dict = {1: "model_log_reg.pkl", 2: "model_xgb_gs.pkl"}
+
+
+class LoadedModel:
+    """
+    Модель вместе с признаками файла, из которого она прочитана. Версия считается
+    сразу, а сама модель распаковывается при первом обращении к estimator: процессу,
+    которому нужна только версия (ключ кэша), не приходится импортировать sklearn.
+    """
+
+    def __init__(self, name: str, loader, mtime_ns: int, size: int, version: str):
+        self.name = name
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.version = version  # sha256 содержимого файла (первые 16 символов)
+        self._loader = loader
+        self._estimator = None
+        self._lock = threading.Lock()
+
+    @property
+    def estimator(self):
+        if self._estimator is None:
+            with self._lock:
+                if self._estimator is None:
+                    self._estimator = self._loader()
+                    self._loader = None
+        return self._estimator
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._estimator is not None
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(name={self.name}, version={self.version})"
+
+
+class ModelRegistry:
+    """
+    Реестр ML моделей: каждая модель распаковывается из pickle один раз и дальше
+    отдается из памяти. При каждом обращении сверяются mtime и размер файла,
+    и если файл был заменен, модель перечитывается без перезапуска сервиса.
+    """
+
+    def __init__(self, models_dir: str = MODELS_DIR):
+        self.models_dir = models_dir
+        self._models: dict[str, LoadedModel] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.models_dir, name)
+
+    def _load_exported(self, name: str, version: str):
+        # Файл весов (models/export.py) используется, только если выгружен из этого же файла модели.
+        # Веса отображаются в память: процессы на машине делят одну копию через page cache
+        export_path = os.path.splitext(self._path(name))[0] + ".mmap"
+        if not os.path.exists(export_path):
+            return None
+        scorer = ArrayScorer.load(export_path)
+        return scorer if scorer.source_version == version else None
+
+    def _read(self, name: str) -> tuple[bytes, str]:
+        try:
+            with open(self._path(name), "rb") as f:
+                content = f.read()
+        except Exception as e:
+            raise Exception(f"Не удалось загрузить ML модель: {e}")
+        return content, hashlib.sha256(content).hexdigest()[:16]
+
+    def load_pipeline(self, name: str, version: str | None = None):
+        # Исходный sklearn пайплайн: pkl каждый раз читается с диска, содержимое файла в памяти не держим
+        content, file_version = self._read(name)
+        if version is not None and file_version != version:
+            # Файл заменили после расчета версии - get() при следующем обращении перечитает модель
+            raise Exception(f"Не удалось загрузить ML модель: файл {name} изменился при загрузке")
+        try:
+            return pickle.loads(content)
+        except Exception as e:
+            raise Exception(f"Не удалось загрузить ML модель: {e}")
+
+    def _load(self, name: str, stat: os.stat_result) -> LoadedModel:
+        _, version = self._read(name)
+
+        def loader():
+            try:
+                estimator = self._load_exported(name, version)
+            except Exception as e:
+                raise Exception(f"Не удалось загрузить ML модель: {e}")
+            return estimator if estimator is not None else self.load_pipeline(name, version)
+
+        return LoadedModel(name, loader, stat.st_mtime_ns, stat.st_size, version)
+
+    def load_all(self, names, estimators: bool = True) -> None:
+        # Загрузка моделей при старте; estimators=False - только версии, без распаковки
+        for name in names:
+            model = self.get(name)
+            if estimators:
+                model.estimator
+
+    def get(self, name: str) -> LoadedModel:
+        try:
+            stat = os.stat(self._path(name))
+        except OSError as e:
+            raise Exception(f"Не удалось загрузить ML модель: {e}")
+
+        model = self._models.get(name)
+        if model is not None and model.mtime_ns == stat.st_mtime_ns and model.size == stat.st_size:
+            return model
+
+        # Файл новый или изменился - перечитываем под блокировкой,
+        # чтобы параллельные запросы не распаковывали модель одновременно
+        with self._lock:
+            model = self._models.get(name)
+            if model is None or model.mtime_ns != stat.st_mtime_ns or model.size != stat.st_size:
+                model = self._load(name, stat)
+                self._models[name] = model
+        return model
+
+    def loaded(self) -> dict[str, str]:
+        return {name: model.version for name, model in self._models.items() if model.is_loaded}
+
+
+registry = ModelRegistry()
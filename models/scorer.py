@@ -0,0 +1,210 @@
+import math
+import numpy as np
+from models.artifact import load_artifact
+
+
+def _expit(x: float) -> float:
+    # Поэлементно через math.exp: совпадает с scipy.special.expit, который использует sklearn,
+    # до последнего бита (векторная np.exp может отличаться в младшем разряде)
+    try:
+        return 1.0 / (1.0 + math.exp(-x))
+    except OverflowError:
+        return 0.0
+
+
+class ArrayScorer:
+    """
+    Модель, выгруженная из sklearn пайплайна в массивы NumPy (models/export.py).
+    Общая часть - предобработка ColumnTransformer: StandardScaler -> (x - mean) / scale,
+    OneHotEncoder с drop='first' -> сравнение с категориями, LeaveOneOutEncoder ->
+    таблица категория -> среднее. Для расчета не нужны ни sklearn, ни pandas.
+    """
+
+    kind = None
+    # Допустимое расхождение с исходным пайплайном при выгрузке, в единицах младшего разряда
+    parity_ulps = 0
+
+    def __init__(self, values: dict):
+        self.source_version = str(values["source_version"])  # версия pkl, из которого сделана выгрузка
+        self.scaler_mean = values["scaler_mean"]
+        self.scaler_scale = values["scaler_scale"]
+        self.ohe_column = str(values["ohe_column"])
+        self.ohe_categories = list(values["ohe_categories"])   # все категории, первая отброшена
+        self.loo_column = str(values["loo_column"])
+        self.loo_default = float(values["loo_default"])
+        self.loo_table = dict(zip(values["loo_categories"], values["loo_values"].tolist()))
+        self.classes_ = values["classes"]
+
+    @staticmethod
+    def from_values(values: dict) -> "ArrayScorer":
+        return SCORERS[values["kind"]](values)
+
+    @staticmethod
+    def load(path: str) -> "ArrayScorer":
+        # Файл весов (models/artifact.py): массивы отображаются в память без копирования
+        return ArrayScorer.from_values(load_artifact(path))
+
+    def transform(self, numeric: np.ndarray, categorical: dict) -> np.ndarray:
+        # Матрица признаков в порядке выхода ColumnTransformer: числовые, one-hot, leave-one-out
+        n = numeric.shape[0]
+        n_ohe = len(self.ohe_categories) - 1
+        # Порядок F, как у выхода ColumnTransformer: от раскладки зависит порядок суммирования в BLAS
+        X = np.empty((n, numeric.shape[1] + n_ohe + 1), dtype=np.float64, order="F")
+        X[:, :numeric.shape[1]] = numeric
+        X[:, :numeric.shape[1]] -= self.scaler_mean
+        X[:, :numeric.shape[1]] /= self.scaler_scale
+
+        values = categorical[self.ohe_column]
+        unknown = set(values.tolist()) - set(self.ohe_categories)
+        if unknown:
+            # Как OneHotEncoder(handle_unknown='error')
+            raise ValueError(f"Неизвестные значения {self.ohe_column}: {sorted(map(str, unknown))}")
+        for i, category in enumerate(self.ohe_categories[1:]):
+            X[:, numeric.shape[1] + i] = values == category
+
+        # Неизвестные и пустые категории получают общее среднее, как в LeaveOneOutEncoder
+        X[:, -1] = np.fromiter((self.loo_table.get(value, self.loo_default) for value in categorical[self.loo_column]),
+                               dtype=np.float64, count=n)
+        return X
+
+    def predict_proba(self, numeric: np.ndarray, categorical: dict) -> np.ndarray:
+        raise NotImplementedError
+
+
+class LinearScorer(ArrayScorer):
+    """Логистическая регрессия: скалярное произведение с коэффициентами и сигмоида."""
+
+    kind = "linear"
+
+    def __init__(self, values: dict):
+        super().__init__(values)
+        self.coef = values["coef"]
+        self.intercept = values["intercept"]
+
+    def predict_proba(self, numeric: np.ndarray, categorical: dict) -> np.ndarray:
+        # Те же операции, что LogisticRegression.predict_proba для двух классов
+        decision = (self.transform(numeric, categorical) @ self.coef.T + self.intercept).ravel()
+        probability = np.fromiter(map(_expit, decision.tolist()), dtype=np.float64, count=decision.shape[0])
+        return np.vstack([1 - probability, probability]).T
+
+
+class TreeScorer(ArrayScorer):
+    """
+    Градиентный бустинг XGBoost (binary:logistic) с числовыми разбиениями. Все
+    деревья склеены в одни массивы узлов, у листа обе ссылки указывают на него самого.
+
+    Расчет по схеме QuickScorer: у узла есть маска листьев его дерева, которые
+    остаются возможными, если условие x < threshold ложно (все, кроме листьев левого
+    поддерева); выход из дерева - самый левый лист после AND масок всех ложных узлов.
+    Ложные узлы признака - узлы с порогом <= x, то есть префикс отсортированных
+    порогов, поэтому AND их масок по всем деревьям - одна строка таблицы префиксов
+    по номеру интервала x. Строка считается за одну выборку таблицы на признак,
+    без обхода узлов. Таблицы строятся при загрузке (сотни КБ на процесс).
+    """
+
+    kind = "trees"
+    # Сигмоида XGBoost считается через expf libm, np.exp может отличаться в младшем разряде float32
+    parity_ulps = 1
+    # Строк в одном проходе: маски порции остаются в кэше процессора
+    chunk_rows = 256
+    max_leaves = 64  # листьев в дереве - бит в маске uint64
+
+    def __init__(self, values: dict):
+        super().__init__(values)
+        self.tree_roots = values["tree_roots"]
+        self.tree_feature = values["tree_feature"]
+        self.tree_threshold = values["tree_threshold"]
+        self.tree_left = values["tree_left"]
+        self.tree_right = values["tree_right"]
+        self.tree_default_left = values["tree_default_left"]
+        self.tree_value = values["tree_value"]
+        self.depth = int(values["depth"])
+        self.base_margin = np.float32(values["base_margin"])
+        self._build_masks()
+
+    def _build_masks(self) -> None:
+        n_trees = len(self.tree_roots)
+        is_leaf = self.tree_left == np.arange(len(self.tree_left))
+        node_tree = np.empty(len(self.tree_left), dtype=np.int64)
+        node_mask = np.zeros(len(self.tree_left), dtype=np.uint64)
+        # Значения листьев дерева слева направо, номер листа - номер бита маски
+        self.leaf_values = np.zeros((n_trees, self.max_leaves), dtype=np.float32)
+
+        def walk(node: int, tree: int, first_leaf: int) -> int:
+            # Возвращает номер следующего листа после поддерева node
+            node_tree[node] = tree
+            if is_leaf[node]:
+                if first_leaf >= self.max_leaves:
+                    raise ValueError(f"Поддерживаются деревья не больше чем с {self.max_leaves} листьями")
+                self.leaf_values[tree, first_leaf] = self.tree_value[node]
+                return first_leaf + 1
+            middle = walk(int(self.tree_left[node]), tree, first_leaf)
+            node_mask[node] = ~np.uint64(((1 << middle - first_leaf) - 1) << first_leaf)
+            return walk(int(self.tree_right[node]), tree, middle)
+
+        for tree, root in enumerate(self.tree_roots):
+            walk(int(root), tree, 0)
+
+        # По каждому признаку: его пороги по возрастанию и таблица префиксов масок
+        # (строка k - AND масок узлов с k наименьшими порогами, по всем деревьям)
+        n_features = len(self.scaler_mean) + len(self.ohe_categories)
+        self.feature_thresholds, self.feature_masks = [], []
+        for feature in range(n_features):
+            nodes = np.flatnonzero(~is_leaf & (self.tree_feature == feature))
+            thresholds = np.unique(self.tree_threshold[nodes])
+            masks = np.full((len(thresholds) + 1, n_trees), ~np.uint64(0), dtype=np.uint64)
+            rank = np.searchsorted(thresholds, self.tree_threshold[nodes])
+            for k in range(len(thresholds)):
+                masks[k + 1] = masks[k]
+                np.bitwise_and.at(masks[k + 1], node_tree[nodes[rank == k]], node_mask[nodes[rank == k]])
+            self.feature_thresholds.append(thresholds)
+            self.feature_masks.append(masks)
+        self.leaf_offset = np.arange(n_trees, dtype=np.int64) * self.max_leaves
+
+    def margin(self, numeric: np.ndarray, categorical: dict) -> np.ndarray:
+        # XGBoost сравнивает признаки во float32
+        X = self.transform(numeric, categorical).astype(np.float32)
+        # Номер интервала - число порогов признака не больше x: ровно столько узлов признака ложны
+        bins = [np.searchsorted(thresholds, X[:, f], side="right")
+                for f, thresholds in enumerate(self.feature_thresholds)]
+
+        margin = np.empty(X.shape[0], dtype=np.float32)
+        for start in range(0, X.shape[0], self.chunk_rows):
+            chunk = slice(start, start + self.chunk_rows)
+            leaves = self.feature_masks[0][bins[0][chunk]]
+            for masks, feature_bins in zip(self.feature_masks[1:], bins[1:]):
+                leaves &= masks[feature_bins[chunk]]
+            # Самый левый оставшийся лист: младший установленный бит (степень двойки точна во float64)
+            lowest = leaves & (~leaves + np.uint64(1))
+            index = np.frexp(lowest.astype(np.float64))[1] - 1 + self.leaf_offset
+            margin[chunk] = self._sum_leaves(np.take(self.leaf_values, index))
+        missing = np.isnan(X).any(axis=1)
+        if missing.any():
+            # Пропуск идет в сторону default_left узла - такие строки проходят деревья по узлам
+            margin[missing] = self._sum_leaves(self.tree_value[self._leaves_missing(X[missing])])
+        return margin
+
+    def _leaves_missing(self, X: np.ndarray) -> np.ndarray:
+        rows = np.arange(X.shape[0])[:, None]
+        node = np.repeat(self.tree_roots[None, :], X.shape[0], axis=0)
+        for _ in range(self.depth):
+            x = X[rows, self.tree_feature[node]]
+            go_left = (x < self.tree_threshold[node]) | (np.isnan(x) & self.tree_default_left[node])
+            node = np.where(go_left, self.tree_left[node], self.tree_right[node])
+        return node
+
+    def _sum_leaves(self, leaf_values: np.ndarray) -> np.ndarray:
+        # Листья суммируются во float32 по порядку деревьев, как в XGBoost (add.accumulate последовательный)
+        leaves = np.empty((leaf_values.shape[0], leaf_values.shape[1] + 1), dtype=np.float32)
+        leaves[:, 0] = self.base_margin
+        leaves[:, 1:] = leaf_values
+        return np.add.accumulate(leaves, axis=1)[:, -1]
+
+    def predict_proba(self, numeric: np.ndarray, categorical: dict) -> np.ndarray:
+        margin = self.margin(numeric, categorical)
+        exp = np.exp(-margin.astype(np.float64)).astype(np.float32)
+        probability = np.float32(1) / (np.float32(1) + exp)
+        return np.vstack([1 - probability, probability]).T
+
+
+SCORERS = {scorer.kind: scorer for scorer in (LinearScorer, TreeScorer)}
@@ -0,0 +1,102 @@
+"""
+Сверка выгруженных моделей (models/export.py, models/scorer.py) с исходными
+sklearn пайплайнами: обе модели выгружаются во временный каталог, вероятности
+LinearScorer / TreeScorer сравниваются с pipeline.predict_proba:
+    python -m pytest tests/test_export.py
+"""
+import os
+import pickle
+import shutil
+import numpy as np
+import pytest
+
+# Для исходных пайплайнов нужны библиотеки обучения
+pytest.importorskip("sklearn")
+pytest.importorskip("xgboost")
+pytest.importorskip("category_encoders")
+
+from models.export import export_model, synthetic_features
+from models.models import features_frame
+from models.registry import MODELS_DIR, models_dict
+from models.scorer import ArrayScorer, LinearScorer, TreeScorer
+
+PARITY_ROWS = 2000
+# Вероятности деревьев XGBoost считает во float32
+ATOL = 1e-6
+
+
+@pytest.fixture(scope="module", params=list(models_dict.values()))
+def exported(request, tmp_path_factory):
+    models_dir = tmp_path_factory.mktemp("models")
+    shutil.copy(os.path.join(MODELS_DIR, request.param), models_dir)
+    export_path = export_model(request.param, str(models_dir), parity_rows=PARITY_ROWS)
+    with open(os.path.join(models_dir, request.param), "rb") as f:
+        pipeline = pickle.load(f)
+    return pipeline, ArrayScorer.load(export_path)
+
+
+def assert_parity(pipeline, scorer, numeric, categorical):
+    expected = pipeline.predict_proba(features_frame(numeric, categorical))
+    actual = scorer.predict_proba(numeric, categorical)
+    assert actual.shape == expected.shape
+    np.testing.assert_allclose(actual, expected, rtol=0, atol=ATOL)
+    np.testing.assert_array_equal(expected.argmax(axis=1), actual.argmax(axis=1))
+
+
+def test_scorer_kind(exported):
+    pipeline, scorer = exported
+    expected = LinearScorer if "regression" in pipeline.named_steps else TreeScorer
+    assert type(scorer) is expected
+    np.testing.assert_array_equal(scorer.classes_, pipeline.classes_)
+
+
+def test_parity_synthetic(exported):
+    pipeline, scorer = exported
+    # Другое зерно, чем у сверки при выгрузке
+    numeric, categorical = synthetic_features(scorer, PARITY_ROWS, seed=1)
+    assert_parity(pipeline, scorer, numeric, categorical)
+
+
+def test_parity_single_row(exported):
+    pipeline, scorer = exported
+    numeric, categorical = synthetic_features(scorer, 1, seed=2)
+    assert_parity(pipeline, scorer, numeric, categorical)
+
+
+def test_parity_unseen_and_missing_neighbourhood(exported):
+    # Неизвестный и пустой район получают общее среднее LeaveOneOutEncoder
+    pipeline, scorer = exported
+    numeric, categorical = synthetic_features(scorer, 3, seed=3)
+    categorical[scorer.loo_column] = np.array(["РАЙОН, КОТОРОГО НЕ БЫЛО", None, ""], dtype=object)
+    assert_parity(pipeline, scorer, numeric, categorical)
+
+
+def test_parity_extreme_values(exported):
+    pipeline, scorer = exported
+    numeric, categorical = synthetic_features(scorer, 4, seed=4)
+    numeric[0] = 0
+    numeric[1] = scorer.scaler_mean + 100 * scorer.scaler_scale
+    numeric[2] = scorer.scaler_mean - 100 * scorer.scaler_scale
+    assert_parity(pipeline, scorer, numeric, categorical)
+
+
+def test_unseen_one_hot_category_raises(exported):
+    # OneHotEncoder(handle_unknown='error'): выгрузка, как и пайплайн, не считает неизвестную категорию
+    pipeline, scorer = exported
+    numeric, categorical = synthetic_features(scorer, 2, seed=5)
+    categorical[scorer.ohe_column] = np.array([scorer.ohe_categories[0], "X"], dtype=object)
+    with pytest.raises(ValueError):
+        pipeline.predict_proba(features_frame(numeric, categorical))
+    with pytest.raises(ValueError):
+        scorer.predict_proba(numeric, categorical)
+
+
+def test_tree_parity_missing_numeric(exported):
+    # Пропуск в числовом признаке XGBoost ведет в сторону default_left узла
+    pipeline, scorer = exported
+    if not isinstance(scorer, TreeScorer):
+        pytest.skip("Логистическая регрессия не принимает пропуски")
+    numeric, categorical = synthetic_features(scorer, 300, seed=6)
+    numeric[::3, 0] = np.nan
+    numeric[1::7, -1] = np.nan
+    assert_parity(pipeline, scorer, numeric, categorical)
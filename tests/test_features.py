@@ -0,0 +1,109 @@
+"""
+Инкрементальный пересчет признаков пациентов (core/use_cases/features.py) на
+временной схеме Postgres из переменных окружения (config/db_settings.py); без
+доступной базы тесты пропускаются:
+    python -m pytest tests/test_features.py
+"""
+import asyncio
+import datetime
+import uuid
+import pytest
+from sqlalchemy import text
+from sqlalchemy.pool import NullPool
+
+try:
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    from config.database import Base, DATABASE_URL
+    from core.entities import Outcome, Patient
+    from core.use_cases import features
+except ValueError as e:
+    # Не заданы переменные окружения базы: URL не разбирается
+    pytest.skip(f"База не настроена: {e}", allow_module_level=True)
+
+TABLES = [Patient.Patient.__table__, Outcome.Outcome.__table__, Outcome.Watermark.__table__,
+          Outcome.PendingOutcome.__table__]
+
+
+@pytest.fixture
+def schema(monkeypatch):
+    # Отдельная схема: пересчет не трогает исходы и позицию рабочей базы
+    name = f"test_features_{uuid.uuid4().hex[:8]}"
+    engine = create_async_engine(DATABASE_URL, poolclass=NullPool,
+                                 connect_args={"server_settings": {"search_path": name}})
+
+    async def create():
+        async with engine.begin() as conn:
+            await conn.execute(text(f"CREATE SCHEMA {name}"))
+            await conn.run_sync(Base.metadata.create_all, tables=TABLES)
+
+    async def drop():
+        async with engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA {name} CASCADE"))
+        await engine.dispose()
+
+    try:
+        asyncio.run(create())
+    except (OSError, ConnectionError) as e:
+        pytest.skip(f"База недоступна: {e}")
+    monkeypatch.setattr(features, "async_session_maker", async_sessionmaker(engine, expire_on_commit=False))
+    yield engine
+    asyncio.run(drop())
+
+
+async def execute(engine, sql: str, **params):
+    async with engine.begin() as conn:
+        return (await conn.execute(text(sql), params)).all() if sql.lstrip().upper().startswith("SELECT") \
+            else await conn.execute(text(sql), params)
+
+
+async def add_patient(engine, patient_id: int) -> None:
+    await execute(engine, """
+        INSERT INTO patients (patient_id, gender, age, neighbourhood, scholarship, hipertension, diabetes,
+                              alcoholism, handcap, sms_received, no_show_cumsum, appointment_cumcount, no_show_ratio)
+        VALUES (:patient_id, 'F', 30, 'CENTRO', false, false, false, false, false, false, 0, 0, 0)
+    """, patient_id=patient_id)
+
+
+async def add_outcome(engine, appointment_id: int, patient_id: int, no_show: bool) -> None:
+    await execute(engine, """
+        INSERT INTO outcomes (appointment_id, patient_id, appointment_date, no_show)
+        VALUES (:appointment_id, :patient_id, :appointment_date, :no_show)
+    """, appointment_id=appointment_id, patient_id=patient_id,
+        appointment_date=datetime.date(2025, 5, 1), no_show=no_show)
+
+
+async def counters(engine) -> dict:
+    rows = await execute(engine, "SELECT patient_id, no_show_cumsum, appointment_cumcount, no_show_ratio FROM patients")
+    return {patient_id: (cumsum, cumcount, ratio) for patient_id, cumsum, cumcount, ratio in rows}
+
+
+def test_orphan_outcome_does_not_block_later_outcomes(schema):
+    async def scenario():
+        await add_patient(schema, 1)
+        await add_patient(schema, 2)
+        # Исход пациента 3 пришел раньше выгрузки пациента и стоит перед исходами известных пациентов
+        await add_outcome(schema, 10, patient_id=3, no_show=True)
+        await add_outcome(schema, 11, patient_id=1, no_show=True)
+        await add_outcome(schema, 12, patient_id=2, no_show=False)
+        await add_outcome(schema, 13, patient_id=1, no_show=False)
+
+        assert await features.refresh_patient_features() == 4
+        assert await counters(schema) == {1: (1, 2, 50.0), 2: (0, 1, 0.0)}
+        assert await execute(schema, "SELECT count(*) FROM pending_outcomes") == [(1,)]
+        assert await execute(schema, "SELECT last_id FROM watermarks") == \
+            await execute(schema, "SELECT max(outcome_id) FROM outcomes")
+
+        # Пациента все еще нет: отложенный исход ждет, новые исходы учитываются
+        await add_outcome(schema, 14, patient_id=2, no_show=True)
+        assert await features.refresh_patient_features() == 1
+        assert await counters(schema) == {1: (1, 2, 50.0), 2: (1, 2, 50.0)}
+
+        # Пациент появился: отложенный исход учитывается один раз
+        await add_patient(schema, 3)
+        assert await features.refresh_patient_features() == 1
+        assert (await counters(schema))[3] == (1, 1, 100.0)
+        assert await execute(schema, "SELECT count(*) FROM pending_outcomes") == [(0,)]
+        assert await features.refresh_patient_features() == 0
+        assert await counters(schema) == {1: (1, 2, 50.0), 2: (1, 2, 50.0), 3: (1, 1, 100.0)}
+
+    asyncio.run(scenario())